@@ -0,0 +1,56 @@
+"""Ограниченный пул потоков для фоновых задач после ответа на запрос."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundExecutor:
+    """
+    Пул потоков с ограниченной очередью.
+
+    Потоки создаются при первой задаче. Если задач в очереди и в работе
+    уже max_pending, новая отбрасывается, а submit возвращает False.
+    Ошибки задач записываются в лог и до запроса не доходят.
+    """
+
+    def __init__(self, name, max_workers, max_pending):
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.pending = threading.BoundedSemaphore(max_pending)
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name
+                )
+        return self.executor
+
+    def run(self, function, *args):
+        try:
+            function(*args)
+        except Exception:
+            logger.exception(
+                'Фоновая задача %s%r завершилась ошибкой',
+                function.__name__, args
+            )
+        finally:
+            self.pending.release()
+            close_old_connections()
+
+    def submit(self, function, *args):
+        if not self.pending.acquire(blocking=False):
+            logger.warning(
+                'Очередь %s переполнена, задача %s%r отброшена',
+                self.name, function.__name__, args
+            )
+            return False
+        self.get_executor().submit(self.run, function, *args)
+        return True
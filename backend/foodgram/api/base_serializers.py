@@ -1,26 +1,37 @@
 from rest_framework import serializers
 
+from api.constants import BATCH_MAX_IDS
+from api.recipes.images import get_variant_urls
 from recipes.models import Recipe
 
 
-class ForWriteSeirlizer(serializers.ModelSerializer):
+class RelationIdsSerializer(serializers.Serializer):
+    """Список id рецептов или авторов для пакетного запроса."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_MAX_IDS
+    )
 
-    def validate(self, attrs):
-        relation = self.Meta.model.objects.filter(
-            user=self.context['request'].user,
-            relation_id=attrs['relation_id']
-        )
-        if self.context['request'].method == 'DELETE':
-            if not relation.exists():
-                raise serializers.ValidationError('Связи не существует')
-            return attrs
-        if relation.exists():
-            raise serializers.ValidationError('Связь уже существует')
-        return attrs
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return get_variant_urls(value, self.context.get('request'))
 
 
 class FavoriteCartSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
@@ -0,0 +1,174 @@
+"""Кэш ответов на анонимные запросы к рецептам."""
+import time
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from api.constants import CACHED_QUERY_PARAMS, RECIPES_CACHE_PREFIX
+from recipes.models import Tag
+
+GENERATION_KEY = f'{RECIPES_CACHE_PREFIX}:generation'
+HITS_KEY = f'{RECIPES_CACHE_PREFIX}:hits'
+MISSES_KEY = f'{RECIPES_CACHE_PREFIX}:misses'
+TAG_IDS_KEY = f'{RECIPES_CACHE_PREFIX}:tag_ids'
+INGREDIENTS_VERSION_KEY = 'ingredients:version'
+TAGS_VERSION_KEY = 'tags:version'
+
+
+def get_cache():
+    return caches[settings.RECIPES_CACHE_ALIAS]
+
+
+def increment(key):
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключ мог быть вытеснен между add и incr
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def get_version(key):
+    # Пропавший из кэша ключ получает новое значение, чтобы после
+    # вытеснения не вернуться к уже виденной процессами версии
+    return get_cache().get_or_set(key, time.time_ns, timeout=None)
+
+
+def bump_version(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate():
+    """Сбрасывает все закэшированные ответы сменой поколения ключей."""
+    bump_version(GENERATION_KEY)
+
+
+def get_stats():
+    cache = get_cache()
+    values = cache.get_many((HITS_KEY, MISSES_KEY))
+    return values.get(HITS_KEY, 0), values.get(MISSES_KEY, 0)
+
+
+def reset_stats():
+    get_cache().delete_many((HITS_KEY, MISSES_KEY))
+
+
+def get_tag_ids(slugs):
+    """Возвращает id тэгов по слагам из закэшированной карты тэгов."""
+    cache = get_cache()
+    tag_ids = cache.get(TAG_IDS_KEY)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_IDS_KEY, tag_ids, timeout=None)
+    return [tag_ids[slug] for slug in slugs if slug in tag_ids]
+
+
+def invalidate_tag_ids():
+    get_cache().delete(TAG_IDS_KEY)
+
+
+def is_cacheable(request):
+    return (
+        request.method == 'GET'
+        and not request.user.is_authenticated
+        and set(request.query_params) <= set(CACHED_QUERY_PARAMS)
+    )
+
+
+def build_key(request, name):
+    params = [
+        (param, value)
+        for param in CACHED_QUERY_PARAMS
+        for value in sorted(request.query_params.getlist(param))
+    ]
+    generation = get_version(GENERATION_KEY)
+    # Хост входит в ключ, так как ссылки в ответе абсолютные
+    digest = md5(
+        f'{request.get_host()}?{urlencode(params)}'.encode()
+    ).hexdigest()
+    return f'{RECIPES_CACHE_PREFIX}:{generation}:{name}:{digest}'
+
+
+class AnonymousCacheMixin:
+    """Отдаёт анонимным пользователям закэшированные list и retrieve."""
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            'list', super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            f'detail:{kwargs.get(self.lookup_field)}',
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def get_cached_response(self, name, handler, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        cache = get_cache()
+        key = build_key(request, name)
+        data = cache.get(key)
+        if data is not None:
+            increment(HITS_KEY)
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = handler(request, *args, **kwargs)
+        increment(MISSES_KEY)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPES_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+def get_etag(*version_keys):
+    return '"{}"'.format(
+        '-'.join(str(get_version(key)) for key in version_keys)
+    )
+
+
+def is_not_modified(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+class ETagMixin:
+    """
+    Строгий ETag для list и retrieve по версиям данных в общем кэше.
+
+    Совпавший If-None-Match получает 304 без обращения к БД.
+    """
+    etag_version_keys = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        etag = get_etag(*self.etag_version_keys)
+        if is_not_modified(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,229 @@
+"""Выгрузка списка покупок в текстовом, CSV и PDF форматах."""
+import csv
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.negotiation import BaseContentNegotiation
+
+from api.cache import get_cache
+from recipes.models import (RecipeIngredient,
+                            ShoppingCartIngredient,
+                            ShoppingCartRecipe)
+from users.models import ApiUser
+
+logger = logging.getLogger(__name__)
+
+CART_FILENAME = 'shopping_cart'
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+PDF_FONT_NAME = 'CartFont'
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 18
+PDF_MARGIN = 56
+STREAM_CHUNK_SIZE = 64 * 1024
+CART_EXPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_recipe_ingredient_ids(recipe_id):
+    return list(
+        RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', flat=True)
+    )
+
+
+@transaction.atomic
+def refresh_cart_ingredients(user_ids, ingredient_ids=None):
+    """
+    Пересчитывает агрегат корзины для пользователей и ингредиентов.
+
+    Затрагиваются только переданные ингредиенты (None — все), суммы
+    берутся одним сгруппированным запросом. Строки пользователей
+    блокируются, чтобы параллельные изменения корзины не разошлись.
+    """
+    user_ids = list(
+        ApiUser.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+    if not user_ids:
+        return
+    source = RecipeIngredient.objects.filter(
+        recipe__shoppingcartrecipe__user__in=user_ids
+    )
+    current = ShoppingCartIngredient.objects.filter(user__in=user_ids)
+    if ingredient_ids is not None:
+        source = source.filter(ingredient_id__in=ingredient_ids)
+        current = current.filter(ingredient_id__in=ingredient_ids)
+    totals = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in source.values_list(
+            'recipe__shoppingcartrecipe__user', 'ingredient'
+        ).annotate(amount=Sum('amount')).order_by()
+    }
+    stale = [
+        pk for pk, user_id, ingredient_id in current.values_list(
+            'pk', 'user_id', 'ingredient_id'
+        )
+        if (user_id, ingredient_id) not in totals
+    ]
+    if stale:
+        ShoppingCartIngredient.objects.filter(pk__in=stale).delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for (user_id, ingredient_id), amount in totals.items()
+        ),
+        update_conflicts=True,
+        unique_fields=('user', 'ingredient'),
+        update_fields=('amount',)
+    )
+    bump_cart_versions(user_ids)
+
+
+def bump_cart_versions(user_ids):
+    """Делает устаревшими закэшированные выгрузки корзин пользователей."""
+    ApiUser.objects.filter(pk__in=user_ids).update(
+        cart_version=F('cart_version') + 1
+    )
+
+
+def invalidate_ingredient_carts(ingredient):
+    """Сбрасывает выгрузки корзин, в которых есть ингредиент."""
+    bump_cart_versions(
+        ShoppingCartIngredient.objects.filter(
+            ingredient=ingredient
+        ).values('user')
+    )
+
+
+def refresh_recipe_carts(recipe, ingredient_ids=None):
+    """Обновляет корзины всех пользователей, добавивших рецепт."""
+    refresh_cart_ingredients(
+        ShoppingCartRecipe.objects.filter(
+            relation=recipe
+        ).values_list('user_id', flat=True),
+        ingredient_ids
+    )
+
+
+def get_export_cache_key(user, export_format):
+    # Пользователь из JWT собирается без запроса к БД, версия корзины
+    # в нём не хранится
+    cart_version = ApiUser.objects.filter(
+        pk=user.pk
+    ).values_list('cart_version', flat=True).first()
+    return f'cart:{user.pk}:{cart_version}:{export_format}'
+
+
+def cache_chunks(key, chunks):
+    """Отдаёт части выгрузки и сохраняет её целиком после отправки."""
+    content = []
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        content.append(chunk)
+        yield chunk
+    get_cache().set(key, b''.join(content), CART_EXPORT_CACHE_TIMEOUT)
+
+
+class CartExportNegotiation(BaseContentNegotiation):
+    """
+    Параметр format у выгрузки выбирает формат файла, а не рендерер DRF.
+
+    Ответы с ошибками отдаются первым рендерером вьюсета.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    """Псевдофайл для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_txt(items):
+    for name, unit, amount in items:
+        yield f'{name} — {amount} {unit}\n'
+
+
+def render_csv(items):
+    writer = csv.writer(Echo())
+    # BOM нужен, чтобы Excel распознал кодировку UTF-8
+    yield '\ufeff' + writer.writerow(CSV_HEADER)
+    for row in items:
+        yield writer.writerow(row)
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    try:
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.CART_PDF_FONT_PATH)
+        )
+    except (OSError, TTFError):
+        logger.warning(
+            'Не удалось загрузить шрифт %s, кириллица в PDF не отобразится',
+            settings.CART_PDF_FONT_PATH
+        )
+        return 'Helvetica'
+    return PDF_FONT_NAME
+
+
+def render_pdf(items):
+    """
+    Постраничный PDF со списком покупок.
+
+    PDF собирается целиком, так как таблица ссылок пишется в конце
+    файла, и затем отдаётся частями.
+    """
+    font = get_pdf_font()
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    page = 1
+
+    def start_page():
+        pdf.setFont(font, PDF_FONT_SIZE)
+        pdf.drawRightString(
+            width - PDF_MARGIN, PDF_MARGIN / 2, str(page)
+        )
+        return height - PDF_MARGIN
+
+    y = start_page()
+    pdf.drawString(PDF_MARGIN, y, 'Список покупок')
+    y -= PDF_LINE_HEIGHT * 2
+    for name, unit, amount in items:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            page += 1
+            y = start_page()
+        pdf.drawString(PDF_MARGIN, y, f'{name} — {amount} {unit}')
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    while chunk := buffer.read(STREAM_CHUNK_SIZE):
+        yield chunk
+
+
+CART_EXPORT_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+"""Форматы выгрузки: генератор содержимого и тип ответа."""
@@ -29,3 +29,54 @@ MAX_VALIDATOR_ERROR_MESSAGE = 'Введено слишком большое ко
 
 MAX_AMOUNT_VALUE = 10000
 """Максимально допустимое значение для количества ингредиента."""
+
+RECIPES_CACHE_PREFIX = 'recipes'
+"""Префикс ключей кэша ответов для рецептов."""
+
+CACHED_QUERY_PARAMS = ('page', 'limit', 'cursor', 'tags', 'author')
+"""Параметры запроса, по которым строится ключ кэша ответов."""
+
+INGREDIENTS_SEARCH_LIMIT = 50
+"""Максимальное число ингредиентов в ответе на поиск по имени."""
+
+INGREDIENT_INDEX_TTL = 300
+"""Время, через которое индекс ингредиентов в памяти перечитывается
+из БД, даже если версия в кэше не менялась, в секундах."""
+
+REFERENCE_CACHE_MAX_AGE = 60 * 60 * 24
+"""Время жизни справочных данных в кэше клиента, в секундах."""
+
+IMAGE_VARIANT_SIZES = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+"""Максимальные размеры уменьшенных копий изображения рецепта."""
+
+IMAGE_VARIANTS_DIR = 'variants'
+"""Каталог в MEDIA_ROOT для уменьшенных копий изображений."""
+
+FEED_MAX_LENGTH = 500
+"""Максимальное число рецептов в ленте подписок пользователя."""
+
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+"""Число подписчиков, сверх которого рецепты автора не раскладываются
+по лентам, а подтягиваются при чтении."""
+
+IMPORT_BATCH_SIZE = 1000
+"""Число ингредиентов в одном INSERT при импорте из файла."""
+
+BATCH_MAX_IDS = 100
+"""Максимальное число id в одном пакетном запросе к избранному,
+корзине или подпискам."""
+
+SEARCH_CONFIG = 'russian'
+"""Конфигурация полнотекстового поиска PostgreSQL для рецептов."""
+
+SIMILAR_RECIPES_LIMIT = 10
+"""Число похожих рецептов, которое хранится для каждого рецепта."""
+
+SIMILAR_TAG_WEIGHT = 0.5
+"""Вес тэга относительно ингредиента при сравнении рецептов."""
+
+SIMILAR_BATCH_SIZE = 1000
+"""Число рецептов, для которых соседи считаются за одно умножение матриц."""
@@ -0,0 +1,69 @@
+"""Денормализованные счётчики рецептов и пользователей."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCartRecipe
+from users.models import ApiUser, Subscription
+
+COUNTERS = {
+    FavoriteRecipe: ((Recipe, 'favorites_count', 'relation'),),
+    ShoppingCartRecipe: ((Recipe, 'in_carts_count', 'relation'),),
+    Recipe: ((ApiUser, 'recipes_count', 'author'),),
+    Subscription: ((ApiUser, 'followers_count', 'relation'),),
+}
+"""Модели-связи и счётчики, которые они изменяют: модель со счётчиком,
+поле счётчика и внешний ключ связи на эту модель."""
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def change_counter(model, field, pks, delta):
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        # Счётчик не уходит в минус, если уже разошёлся с данными
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def update_counters(instance, delta):
+    """Изменяет счётчики, которые зависят от созданной или удалённой связи."""
+    for model, field, relation in COUNTERS.get(type(instance), ()):
+        change_counter(
+            model, field, [getattr(instance, f'{relation}_id')], delta
+        )
+
+
+def get_actual_count(relation_model, relation):
+    return Coalesce(
+        Subquery(
+            relation_model.objects.filter(
+                **{relation: OuterRef('pk')}
+            ).order_by().values(relation).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0
+    )
+
+
+def reconcile_counters(batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Исправляет счётчики, разошедшиеся с данными.
+
+    Возвращает число исправленных строк для каждого счётчика.
+    """
+    fixed = {}
+    for relation_model, counters in COUNTERS.items():
+        for model, field, relation in counters:
+            drifted = model.objects.annotate(
+                actual=get_actual_count(relation_model, relation)
+            ).exclude(
+                **{field: F('actual')}
+            ).values_list('pk', 'actual')
+            objects = [
+                model(pk=pk, **{field: actual})
+                for pk, actual in drifted.iterator()
+            ]
+            model.objects.bulk_update(objects, (field,), batch_size)
+            fixed[f'{model._meta.model_name}.{field}'] = len(objects)
+    return fixed
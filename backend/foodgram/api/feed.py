@@ -0,0 +1,177 @@
+"""
+Лента рецептов от авторов, на которых подписан пользователь.
+
+Новые рецепты раскладываются по лентам подписчиков при создании
+(fan-out on write). Рецепты авторов с очень большим числом подписчиков
+не раскладываются, а подтягиваются при чтении ленты.
+"""
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from api.constants import FEED_FANOUT_MAX_FOLLOWERS, FEED_MAX_LENGTH
+from api.paginators import seek_filter
+from recipes.models import FeedEntry, Recipe
+from users.models import ApiUser, Subscription
+
+
+def is_pulled(author_id):
+    """Рецепты автора не раскладываются по лентам."""
+    return ApiUser.objects.filter(
+        pk=author_id,
+        followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def get_pulled_author_ids(user):
+    return list(
+        ApiUser.objects.filter(
+            subscriptions__user=user,
+            followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('pk', flat=True)
+    )
+
+
+def trim_feeds(user_ids):
+    """
+    Удаляет из лент записи сверх FEED_MAX_LENGTH.
+
+    Для каждой ленты по индексу ищется первая лишняя запись, и удаляются
+    она и всё, что старше неё. Ленты не длиннее предела не меняются.
+    """
+    overflow = FeedEntry.objects.filter(
+        pk__in=ApiUser.objects.filter(pk__in=user_ids).annotate(
+            overflow=Subquery(
+                FeedEntry.objects.filter(
+                    user=OuterRef('pk')
+                ).order_by('-created_at', '-recipe_id').values('pk')[
+                    FEED_MAX_LENGTH:FEED_MAX_LENGTH + 1
+                ]
+            )
+        ).filter(overflow__isnull=False).values('overflow')
+    ).values_list('pk', 'user', 'created_at', 'recipe')
+    condition = Q()
+    for pk, user_id, created_at, recipe_id in overflow:
+        condition |= Q(user=user_id) & (
+            Q(pk=pk)
+            | seek_filter(
+                ('created_at', 'recipe'), (created_at, recipe_id), True
+            )
+        )
+    if condition:
+        FeedEntry.objects.filter(condition).delete()
+
+
+@transaction.atomic
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if is_pulled(recipe.author_id):
+        return
+    follower_ids = list(
+        Subscription.objects.filter(
+            relation=recipe.author_id
+        ).values_list('user_id', flat=True)
+    )
+    if not follower_ids:
+        return
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe=recipe,
+                created_at=recipe.created_at
+            )
+            for user_id in follower_ids
+        ),
+        ignore_conflicts=True
+    )
+    trim_feeds(follower_ids)
+
+
+def fill_feed(user_id, author_ids):
+    """Добавляет в ленту последние рецепты переданных авторов."""
+    recipes = Recipe.objects.filter(
+        author__in=author_ids
+    ).order_by('-created_at', '-id').values_list(
+        'pk', 'created_at'
+    )[:FEED_MAX_LENGTH]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=pk, created_at=created_at)
+            for pk, created_at in recipes
+        ),
+        ignore_conflicts=True
+    )
+
+
+@transaction.atomic
+def follow_authors(user_id, author_ids):
+    fill_feed(
+        user_id,
+        ApiUser.objects.filter(
+            pk__in=author_ids,
+            followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+        ).values('pk')
+    )
+    trim_feeds([user_id])
+
+
+def unfollow_authors(user_id, author_ids):
+    FeedEntry.objects.filter(
+        user=user_id, recipe__author__in=author_ids
+    ).delete()
+
+
+@transaction.atomic
+def rebuild_feed(user):
+    """
+    Собирает ленту пользователя заново по его подпискам.
+
+    Нужна, например, для рецептов, созданных пока автор был среди
+    подтягиваемых при чтении, а потом потерял подписчиков.
+    """
+    FeedEntry.objects.filter(user=user).delete()
+    pulled = get_pulled_author_ids(user)
+    fill_feed(
+        user.pk,
+        Subscription.objects.filter(user=user).exclude(
+            relation__in=pulled
+        ).values('relation')
+    )
+
+
+def get_feed_page(entries, pulled, position, descending, limit):
+    """
+    Страница ленты по ключу (created_at, id) для курсорной пагинации.
+
+    Разложенная часть читается диапазоном по индексу ленты, рецепты
+    подтягиваемых авторов (pulled, может быть None) — отдельным запросом
+    не больше чем на limit строк. Флаги пользователя переносятся
+    из аннотаций записей ленты на рецепты.
+    """
+    order = '-' if descending else ''
+    if position is not None:
+        entries = entries.filter(
+            seek_filter(('created_at', 'recipe'), position, descending)
+        )
+    recipes = {}
+    for entry in entries.order_by(
+        f'{order}created_at', f'{order}recipe_id'
+    )[:limit]:
+        entry.recipe.is_favorited = entry.is_favorited
+        entry.recipe.is_in_shopping_cart = entry.is_in_shopping_cart
+        recipes[entry.recipe_id] = entry.recipe
+    if pulled is not None:
+        if position is not None:
+            pulled = pulled.filter(
+                seek_filter(('created_at', 'id'), position, descending)
+            )
+        for recipe in pulled.order_by(
+            f'{order}created_at', f'{order}id'
+        )[:limit]:
+            # Рецепт мог попасть в ленту, пока автор не был подтягиваемым
+            recipes.setdefault(recipe.pk, recipe)
+    return sorted(
+        recipes.values(),
+        key=lambda recipe: (recipe.created_at, recipe.pk),
+        reverse=descending
+    )[:limit]
@@ -1,5 +1,8 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
+from api.cache import get_tag_ids
+from api.search import search_recipes
 from recipes.models import Ingredient, Recipe
 
 
@@ -16,6 +19,7 @@ class RecipeSearchFilter(filters.FilterSet):
     tags = filters.CharFilter(method='get_tags')
     is_favorited = filters.BooleanFilter(method='get_bool_for_favorite')
     is_in_shopping_cart = filters.BooleanFilter(method='get_bool_for_cart')
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
@@ -23,13 +27,30 @@ class RecipeSearchFilter(filters.FilterSet):
             'author',
             'tags',
             'favoriterecipe',
-            'shoppingcartrecipe'
+            'shoppingcartrecipe',
+            'search'
         )
 
     def get_tags(self, queryset, name, value):
-        tags = self.request.query_params.getlist('tags')
-        queryset = Recipe.objects.filter(tags__slug__in=tags).distinct()
-        return queryset
+        tag_ids = get_tag_ids(self.request.query_params.getlist('tags'))
+        if not tag_ids:
+            return queryset.none()
+        # EXISTS по уникальному индексу (recipe, tag) промежуточной таблицы
+        # не размножает строки и не требует distinct
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag_id__in=tag_ids
+                )
+            )
+        )
+
+    def get_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
 
     def get_bool_for_cart(self, queryset, name, value):
         user = self.request.user
@@ -38,9 +59,7 @@ class RecipeSearchFilter(filters.FilterSet):
                 return Recipe.objects.none()
             return queryset
         if value and user.is_authenticated:
-            queryset = queryset.filter(
-                shoppingcartrecipe__user=user
-            ).distinct()
+            queryset = queryset.filter(is_in_shopping_cart=True)
         return queryset
 
     def get_bool_for_favorite(self, queryset, name, value):
@@ -50,7 +69,5 @@ class RecipeSearchFilter(filters.FilterSet):
                 return Recipe.objects.none()
             return queryset
         if value and user.is_authenticated:
-            queryset = queryset.filter(
-                favoriterecipe__user=user
-            ).distinct()
+            queryset = queryset.filter(is_favorited=True)
         return queryset
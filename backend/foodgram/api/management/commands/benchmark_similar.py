@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.constants import SIMILAR_BATCH_SIZE, SIMILAR_RECIPES_LIMIT
+from api.similar import build_matrix, get_neighbours
+
+
+def generate_pairs(rng, recipes, features, per_recipe):
+    """Пары (рецепт, признак): популярность признаков убывает по Ципфу."""
+    weights = 1 / np.arange(1, features + 1)
+    weights /= weights.sum()
+    return np.unique(
+        np.column_stack((
+            np.repeat(np.arange(recipes), per_recipe),
+            rng.choice(features, recipes * per_recipe, p=weights)
+        )),
+        axis=0
+    )
+
+
+class Command(BaseCommand):
+    """
+    Команда для замера времени пересборки похожих рецептов.
+
+    Каталог генерируется в памяти, БД не используется: замеряется
+    построение матриц и поиск соседей для всех рецептов.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SIMILAR_BATCH_SIZE
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, **options):
+        rng = np.random.default_rng(options['seed'])
+        recipes = options['recipes']
+        recipe_ids = np.arange(recipes)
+        ingredient_pairs = generate_pairs(
+            rng, recipes, options['ingredients'], options['per_recipe']
+        )
+        tag_pairs = generate_pairs(rng, recipes, options['tags'], 2)
+        started = time.perf_counter()
+        ingredients = build_matrix(recipe_ids, ingredient_pairs)
+        tags = build_matrix(recipe_ids, tag_pairs)
+        built = time.perf_counter()
+        found = 0
+        for start in range(0, recipes, options['batch_size']):
+            end = min(start + options['batch_size'], recipes)
+            rows = np.arange(start, end)
+            _, scores = get_neighbours(
+                ingredients, tags, rows, SIMILAR_RECIPES_LIMIT
+            )
+            found += int((scores > 0).sum())
+        finished = time.perf_counter()
+        self.stdout.write(
+            f'Recipes: {recipes}, ingredient pairs: {len(ingredient_pairs)}\n'
+            f'Matrices: {built - started:.3f}s\n'
+            f'Neighbours: {finished - built:.3f}s '
+            f'({recipes / (finished - built):.0f} recipes/s), '
+            f'{found / max(recipes, 1):.1f} per recipe'
+        )
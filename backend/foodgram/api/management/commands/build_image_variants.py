@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from api.recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Команда для построения копий изображений существующих рецептов."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Обработать только рецепты без актуальных копий'
+        )
+
+    def handle(self, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        ).order_by('pk')
+        built = failed = 0
+        for recipe in recipes.iterator():
+            name = recipe.image.name
+            if options['missing'] and (
+                recipe.image_variants.get('source') == name
+            ):
+                continue
+            try:
+                build_variants(recipe.pk, name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Recipe ID:{recipe.pk} {name}: {error}')
+                continue
+            built += 1
+        self.stdout.write(
+            f'Built image variants for {built} recipes, failed: {failed}'
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    """Команда для вывода статистики кэша ответов по рецептам."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода'
+        )
+
+    def handle(self, **options):
+        hits, misses = get_stats()
+        total = hits + misses
+        ratio = hits / total if total else 0
+        self.stdout.write(
+            f'Hits: {hits}, misses: {misses}, hit ratio: {ratio:.2%}'
+        )
+        if options['reset']:
+            reset_stats()
+            self.stdout.write('Counters reset')
@@ -0,0 +1,137 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import INGREDIENTS_VERSION_KEY, bump_version, invalidate
+from api.constants import IMPORT_BATCH_SIZE, LENGTH_FOR_CHARFIELD
+from recipes.models import Ingredient
+
+READ_CHUNK_SIZE = 64 * 1024
+CSV_HEADER = ['name', 'measurement_unit']
+
+
+def read_csv(file):
+    """Строки CSV с заголовком или без него (название, единица)."""
+    reader = csv.reader(file)
+    for row in reader:
+        if reader.line_num == 1 and row == CSV_HEADER:
+            continue
+        if row:
+            yield row[0], row[1] if len(row) > 1 else ''
+
+
+def read_json(file):
+    """Элементы JSON-массива, разбираемые по мере чтения файла."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON-массив ингредиентов')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        if not isinstance(item, dict):
+            item = {}
+        yield item.get('name', ''), item.get('measurement_unit', '')
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+class Command(BaseCommand):
+    """Команда для пакетного импорта ингредиентов из CSV или JSON."""
+    default_paths = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*')
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файлов; по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только прочитать и проверить файлы, не записывая в БД'
+        )
+
+    def handle(self, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным')
+        paths = options['paths'] or self.default_paths
+        if not paths:
+            raise CommandError('Укажите файлы для импорта')
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        before = Ingredient.objects.count()
+        for path in paths:
+            self.import_file(Path(path), options['format'])
+        if self.dry_run:
+            return
+        created = Ingredient.objects.count() - before
+        if created:
+            # bulk_create не отправляет сигналов, версия справочника
+            # и кэш ответов обновляются вручную
+            bump_version(INGREDIENTS_VERSION_KEY)
+            invalidate()
+        self.stdout.write(f'Created {created} ingredients')
+
+    def import_file(self, path, file_format=None):
+        file_format = file_format or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        try:
+            file = open(path, encoding='utf-8-sig', newline='')
+        except OSError as error:
+            raise CommandError(f'Ошибка при открытии файла: {error}')
+        started = time.monotonic()
+        processed = 0
+        with file:
+            rows = self.validate(READERS[file_format](file))
+            while batch := list(islice(rows, self.batch_size)):
+                if not self.dry_run:
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True
+                    )
+                processed += len(batch)
+                self.report(path, processed, started)
+        self.stdout.write(
+            f'{path}: {processed} rows processed, {self.skipped} invalid rows '
+            f'skipped in {time.monotonic() - started:.2f}s'
+        )
+
+    def validate(self, rows):
+        self.skipped = 0
+        for name, measurement_unit in rows:
+            name = str(name).strip()
+            measurement_unit = str(measurement_unit).strip()
+            if not name or not measurement_unit or max(
+                len(name), len(measurement_unit)
+            ) > LENGTH_FOR_CHARFIELD:
+                self.skipped += 1
+                continue
+            yield Ingredient(name=name, measurement_unit=measurement_unit)
+
+    def report(self, path, processed, started):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else processed
+        self.stdout.write(f'{path}: {processed} rows, {rate:.0f} rows/s')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.feed import rebuild_feed
+from users.models import ApiUser
+
+
+class Command(BaseCommand):
+    """Команда для пересборки лент подписок по существующим подпискам."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            help='Пересобрать ленту только для пользователя с этим id'
+        )
+
+    def handle(self, **options):
+        users = ApiUser.objects.filter(subscriber__isnull=False).distinct()
+        if options['user']:
+            users = ApiUser.objects.filter(pk__in=options['user'])
+        rebuilt = 0
+        for user in users.only('pk').iterator():
+            rebuild_feed(user)
+            rebuilt += 1
+        self.stdout.write(f'Rebuilt feeds for {rebuilt} users')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.recipes.documents import DOCUMENT_BATCH_SIZE, rebuild_documents
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Команда для пересборки документов для чтения рецептов."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Собрать документы только для рецептов без документа'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DOCUMENT_BATCH_SIZE
+        )
+
+    def handle(self, **options):
+        queryset = Recipe.objects.all()
+        if options['missing']:
+            queryset = queryset.filter(document={})
+        rebuilt = rebuild_documents(queryset, options['batch_size'])
+        self.stdout.write(f'Rebuilt documents for {rebuilt} recipes')
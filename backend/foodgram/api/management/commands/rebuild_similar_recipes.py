@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.constants import SIMILAR_BATCH_SIZE
+from api.similar import rebuild_similar
+
+
+class Command(BaseCommand):
+    """Команда для пересборки списков похожих рецептов."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SIMILAR_BATCH_SIZE
+        )
+
+    def handle(self, **options):
+        started = time.perf_counter()
+        rebuilt = rebuild_similar(options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Rebuilt similar recipes for {rebuilt} recipes in {elapsed:.2f}s'
+        )
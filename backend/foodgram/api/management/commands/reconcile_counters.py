@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import RECONCILE_BATCH_SIZE, reconcile_counters
+
+
+class Command(BaseCommand):
+    """Команда для сверки счётчиков рецептов и пользователей с данными."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECONCILE_BATCH_SIZE
+        )
+
+    def handle(self, **options):
+        fixed = reconcile_counters(options['batch_size'])
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}: fixed {count}')
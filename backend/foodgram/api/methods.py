@@ -1,70 +1,185 @@
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from rest_framework import status
 from rest_framework.response import Response
-from django.db.models import F, Sum
+from rest_framework.settings import api_settings
 
-from recipes.models import Recipe
-from users.models import Subscription
+from api.base_serializers import FavoriteCartSerializer, RelationIdsSerializer
+from api.relations import add_relations, remove_relations
+from api.users.serializers import SubscriptionSerializerForRead
+from recipes.models import Recipe, ShoppingCartIngredient
+from users.models import ApiUser, Subscription
 
 
-def detail_post_method(self, request, pk):
+def parse_relation_id(self, pk):
     try:
-        int(pk)
+        return int(pk), None
     except ValueError:
         if self.model_name == Subscription:
-            return Response(
+            return None, Response(
                 'Пользователь не найден',
                 status=status.HTTP_404_NOT_FOUND
             )
-        return Response(
+        return None, Response(
             'Введён некорректный ID',
             status=status.HTTP_400_BAD_REQUEST,
         )
-    serializer = self.get_serializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
-    serializer.save()
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-def detail_delete_method(self, request, pk):
-    try:
-        int(pk)
-    except ValueError:
-        if self.model_name == Subscription:
+def relation_error(message):
+    return Response(
+        {api_settings.NON_FIELD_ERRORS_KEY: [message]},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def detail_post_method(self, request, pk):
+    """
+    Добавляет связь одним INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    Ответ собирается из объекта, прочитанного для проверки
+    существования, без повторного запроса.
+    """
+    pk, error = parse_relation_id(self, pk)
+    if error:
+        return error
+    if self.model_name == Subscription:
+        if pk == request.user.pk:
+            return relation_error('Нельзя подписаться на самого себя')
+        target = ApiUser.objects.filter(pk=pk).first()
+        if target is None:
             return Response(
                 'Пользователь не найден',
                 status=status.HTTP_404_NOT_FOUND
             )
+    else:
+        target = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time'
+        ).filter(pk=pk).first()
+        if target is None:
+            return relation_error('Рецепта не существует')
+    if not add_relations(self.model_name, request.user.pk, [pk]):
+        return relation_error('Связь уже существует')
+    context = {'request': request}
+    if self.model_name == Subscription:
+        target.is_subscribed = True
+        attach_author_recipes([target], get_recipes_limit(request))
+        data = SubscriptionSerializerForRead(target, context=context).data
+    else:
+        data = FavoriteCartSerializer(target, context=context).data
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
+def detail_delete_method(self, request, pk):
+    """Удаляет связь одним DELETE ... RETURNING."""
+    pk, error = parse_relation_id(self, pk)
+    if error:
+        return error
+    if remove_relations(self.model_name, request.user.pk, [pk]):
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    if self.model_name == Subscription and not ApiUser.objects.filter(
+        pk=pk
+    ).exists():
         return Response(
-            'Введён некорректный ID',
-            status=status.HTTP_400_BAD_REQUEST,
+            'Пользователь не найден',
+            status=status.HTTP_404_NOT_FOUND
         )
-    serializer = self.get_serializer(data=request.data)
+    return relation_error('Связи не существует')
+
+
+def get_batch_ids(request):
+    serializer = RelationIdsSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    self.model_name.objects.filter(
-        user=self.request.user,
-        relation=pk
-    ).delete()
-    return Response(status=status.HTTP_204_NO_CONTENT)
-
-
-def get_cart_list(user):
-    queryset = Recipe.objects.filter(
-        shoppingcartrecipe__user=user,
-        id=F('shoppingcartrecipe__relation')
-    ).values(
-        'ingredients__name',
-        'ingredients__measurement_unit'
-    ).annotate(
-        amount=Sum('recipe_ingredients__amount')
+    return serializer.validated_data['ids']
+
+
+def batch_response(results):
+    return Response(
+        {
+            'results': [
+                {'id': pk, 'status': result}
+                for pk, result in results.items()
+            ]
+        },
+        status=status.HTTP_200_OK
     )
-    output = {}
-    for item in queryset:
-        output[item['ingredients__name']] = (
-            str(
-                item['amount']
-            ) + item['ingredients__measurement_unit']
-        )
-    output_str = ''
-    for key, value in output.items():
-        output_str += ' '.join((key, value, '\n'))
-    return output_str
+
+
+def batch_post_method(self, request):
+    """
+    Добавляет пакет связей и возвращает результат для каждого id:
+    created, exists, not_found или self (подписка на себя).
+    """
+    ids = get_batch_ids(request)
+    target = self.model_name._meta.get_field('relation').related_model
+    found = set(
+        target.objects.filter(pk__in=ids).values_list('pk', flat=True)
+    )
+    results = dict.fromkeys(ids, 'not_found')
+    if self.model_name == Subscription and request.user.pk in found:
+        found.discard(request.user.pk)
+        results[request.user.pk] = 'self'
+    valid = [pk for pk in ids if pk in found]
+    created = set(add_relations(self.model_name, request.user.pk, valid))
+    for pk in valid:
+        results[pk] = 'created' if pk in created else 'exists'
+    return batch_response(results)
+
+
+def batch_delete_method(self, request):
+    """Удаляет пакет связей: для каждого id deleted или not_found."""
+    ids = get_batch_ids(request)
+    deleted = set(remove_relations(self.model_name, request.user.pk, ids))
+    return batch_response({
+        pk: 'deleted' if pk in deleted else 'not_found' for pk in ids
+    })
+
+
+def get_cart_items(user):
+    """Суммы ингредиентов корзины из поддерживаемого агрегата."""
+    return ShoppingCartIngredient.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount'
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    )
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def attach_author_recipes(authors, limit=None):
+    """
+    Подгружает рецепты авторов страницы одним запросом.
+
+    При заданном лимите последние рецепты каждого автора отбираются
+    оконной функцией ROW_NUMBER() OVER (PARTITION BY author).
+    """
+    recipes = Recipe.objects.filter(author__in=authors).only(
+        'id', 'author_id', 'name', 'image', 'image_variants', 'cooking_time'
+    )
+    if limit is not None:
+        recipes = recipes.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('created_at').desc(), F('id').desc())
+            )
+        ).filter(row_number__lte=limit)
+    author_recipes = defaultdict(list)
+    for recipe in recipes.order_by('author', '-created_at', '-id'):
+        author_recipes[recipe.author_id].append(recipe)
+    for author in authors:
+        author.page_recipes = author_recipes[author.pk]
+    return authors
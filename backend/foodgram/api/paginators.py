@@ -1,5 +1,147 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def seek_filter(fields, position, descending):
+    """
+    Условие (f1, f2, ...) < (v1, v2, ...) для составного индекса.
+
+    Первое поле ограничено нестрогим неравенством отдельно, чтобы
+    планировщик мог использовать его как границу диапазона индекса.
+    """
+    lookup = 'lt' if descending else 'gt'
+    field, value = fields[0], position[0]
+    if len(fields) == 1:
+        return Q(**{f'{field}__{lookup}': value})
+    return Q(**{f'{field}__{lookup}e': value}) & (
+        Q(**{f'{field}__{lookup}': value})
+        | seek_filter(fields[1:], position[1:], descending)
+    )
 
 
 class LimitParamPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с лимитом и курсорным режимом.
+
+    При наличии параметра cursor страница выбирается по ключу сортировки
+    (keyset), без COUNT и OFFSET. Поля ключа задаются атрибутом
+    cursor_ordering вьюсета и должны сортироваться в одном направлении.
+    Вьюха может отдать курсором собственную выборку через paginate_cursor.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_cursor(
+            lambda position, descending, limit: self.fetch(
+                queryset, position, descending, limit
+            ),
+            request,
+            view
+        )
+
+    def fetch(self, queryset, position, descending, limit):
+        if position is not None:
+            queryset = queryset.filter(
+                seek_filter(self.fields, position, descending)
+            )
+        queryset = queryset.order_by(*(
+            f'-{field}' if descending else field for field in self.fields
+        ))
+        return list(queryset[:limit])
+
+    def paginate_cursor(self, fetch, request, view=None):
+        """
+        Страница курсорного режима.
+
+        fetch(position, descending, limit) возвращает не больше limit
+        объектов после позиции position в порядке ключа сортировки.
+        """
+        self.cursor_mode = True
+        self.request = request
+        self.ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        descending = self.descending != reverse
+        results = fetch(position, descending, page_size + 1)
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def encode_cursor(self, instance, reverse):
+        position = [
+            str(getattr(instance, field)) for field in self.fields
+        ]
+        return base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': reverse}).encode()
+        ).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position, reverse = data['p'], bool(data['r'])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+            len(position) != len(self.fields)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_cursor_link(self, instance, reverse):
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(instance, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.get_cursor_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_cursor_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
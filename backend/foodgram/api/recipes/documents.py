@@ -0,0 +1,33 @@
+"""Массовая пересборка документов для чтения рецептов."""
+from django.db import transaction
+
+from api.search import update_search_vectors
+from recipes.models import Recipe
+from .serializers import RecipeDocumentSerializer, get_document_prefetches
+
+DOCUMENT_BATCH_SIZE = 500
+
+
+def save_batch(batch):
+    Recipe.objects.bulk_update(batch, ('document',))
+    update_search_vectors([recipe.pk for recipe in batch])
+
+
+def rebuild_documents(queryset=None, batch_size=DOCUMENT_BATCH_SIZE):
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    queryset = queryset.select_related('author').prefetch_related(
+        *get_document_prefetches()
+    ).order_by('pk')
+    rebuilt = 0
+    batch = []
+    with transaction.atomic():
+        for recipe in queryset.iterator(chunk_size=batch_size):
+            recipe.document = RecipeDocumentSerializer(recipe).data
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                save_batch(batch)
+                rebuilt += len(batch)
+                batch = []
+        save_batch(batch)
+    return rebuilt + len(batch)
@@ -0,0 +1,103 @@
+"""Уменьшенные копии изображений рецептов в JPEG и WebP."""
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from api.background import BackgroundExecutor
+from api.cache import invalidate
+from api.constants import IMAGE_VARIANT_SIZES, IMAGE_VARIANTS_DIR
+from recipes.models import Recipe
+
+IMAGE_FORMATS = (
+    ('jpeg', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ('webp', 'webp', {'quality': 80, 'method': 4}),
+)
+
+executor = BackgroundExecutor(
+    'image-variants',
+    settings.IMAGE_VARIANTS_WORKERS,
+    settings.IMAGE_VARIANTS_MAX_PENDING
+)
+
+
+def open_image(storage, name):
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def render_variants(storage, name):
+    """Сохраняет копии изображения и возвращает имена их файлов."""
+    image = open_image(storage, name)
+    stem = PurePosixPath(name).stem
+    variants = {'source': name}
+    for variant, size in IMAGE_VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[variant] = {}
+        for image_format, extension, options in IMAGE_FORMATS:
+            if image_format == 'jpeg':
+                output = resized.convert('RGB')
+            else:
+                output = resized
+            buffer = BytesIO()
+            output.save(buffer, image_format, **options)
+            path = f'{IMAGE_VARIANTS_DIR}/{stem}_{variant}.{extension}'
+            variants[variant][image_format] = storage.save(
+                path, ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def build_variants(recipe_id, name):
+    storage = Recipe._meta.get_field('image').storage
+    variants = render_variants(storage, name)
+    # Изображение могло смениться, пока строились копии
+    updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image_variants=variants
+    )
+    if updated:
+        invalidate()
+    return variants
+
+
+def schedule_variants(recipe_id, name):
+    """
+    Ставит построение копий в пул потоков, не блокируя запрос.
+
+    При переполненной очереди задача отбрасывается, такие рецепты
+    догоняет команда build_image_variants --missing.
+    """
+    if not settings.IMAGE_VARIANTS_ASYNC:
+        build_variants(recipe_id, name)
+        return
+    executor.submit(build_variants, recipe_id, name)
+
+
+def get_variant_urls(recipe, request=None):
+    """Ссылки на копии изображения; пока копий нет — на оригинал."""
+    if not recipe.image:
+        return {}
+    storage = recipe.image.storage
+    ready = recipe.image_variants.get('source') == recipe.image.name
+    urls = {}
+    for variant in IMAGE_VARIANT_SIZES:
+        names = recipe.image_variants.get(variant, {}) if ready else {}
+        urls[variant] = {}
+        for image_format, _, _ in IMAGE_FORMATS:
+            url = (
+                storage.url(names[image_format]) if image_format in names
+                else recipe.image.url
+            )
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant][image_format] = url
+    return urls
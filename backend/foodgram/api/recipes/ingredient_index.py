@@ -0,0 +1,79 @@
+"""Индекс ингредиентов в памяти процесса для поиска по началу названия."""
+import json
+import threading
+import time
+from bisect import bisect_left
+
+from api.cache import INGREDIENTS_VERSION_KEY, get_version
+from api.constants import INGREDIENT_INDEX_TTL
+from recipes.models import Ingredient
+
+
+def normalize(name):
+    return name.casefold().replace('ё', 'е')
+
+
+class IngredientPrefixIndex:
+    """
+    Отсортированный по нормализованному названию список ингредиентов.
+
+    Строки ответа кодируются в JSON один раз при загрузке. Индекс
+    загружается лениво и перестраивается, когда меняется версия
+    ингредиентов в общем кэше, поэтому изменения видны всем процессам.
+    Если кэш не общий (локальный кэш процесса), изменения из других
+    процессов подхватываются не позже чем через INGREDIENT_INDEX_TTL.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.expires = 0
+        # Ключи, строки и весь список заменяются одним присваиванием,
+        # чтобы читатели без блокировки не видели смесь версий
+        self.data = ([], [], b'[]')
+
+    def load(self, version):
+        ingredients = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (normalize(row['name']), row['id'])
+        )
+        rows = [
+            json.dumps(
+                row, ensure_ascii=False, separators=(',', ':')
+            ).encode()
+            for row in ingredients
+        ]
+        self.data = (
+            [normalize(row['name']) for row in ingredients],
+            rows,
+            b'[' + b','.join(rows) + b']'
+        )
+        self.version = version
+        self.expires = time.monotonic() + INGREDIENT_INDEX_TTL
+
+    def is_stale(self, version):
+        return self.version != version or time.monotonic() >= self.expires
+
+    def ensure_loaded(self):
+        version = get_version(INGREDIENTS_VERSION_KEY)
+        if self.is_stale(version):
+            with self.lock:
+                if self.is_stale(version):
+                    self.load(version)
+
+    def search(self, prefix, limit):
+        """Возвращает готовый JSON-массив ингредиентов с данным префиксом."""
+        self.ensure_loaded()
+        keys, rows, all_rows = self.data
+        if not prefix:
+            return all_rows
+        prefix = normalize(prefix)
+        start = bisect_left(keys, prefix)
+        end = start
+        while (end < len(keys) and end - start < limit
+               and keys[end].startswith(prefix)):
+            end += 1
+        return b'[' + b','.join(rows[start:end]) + b']'
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,51 @@
+"""Сжатый набор справочных данных: тэги и ингредиенты."""
+import gzip
+import json
+import threading
+
+from api.cache import (INGREDIENTS_VERSION_KEY,
+                       TAGS_VERSION_KEY,
+                       get_etag)
+from recipes.models import Tag
+from .ingredient_index import ingredient_index
+from .serializers import TagSerializer
+
+REFERENCE_VERSION_KEYS = (TAGS_VERSION_KEY, INGREDIENTS_VERSION_KEY)
+
+
+class ReferenceBundle:
+    """Тело ответа, собранное и сжатое один раз на версию данных."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = (None, b'', b'')
+
+    def build(self, etag):
+        tags = json.dumps(
+            TagSerializer(Tag.objects.order_by('id'), many=True).data,
+            ensure_ascii=False,
+            separators=(',', ':')
+        ).encode()
+        content = b''.join((
+            b'{"tags":', tags,
+            b',"ingredients":', ingredient_index.search('', limit=None),
+            b'}'
+        ))
+        self.data = (etag, content, gzip.compress(content))
+
+    def get(self, etag):
+        """Возвращает тело ответа и его сжатую версию."""
+        data = self.data
+        if data[0] != etag:
+            with self.lock:
+                if self.data[0] != etag:
+                    self.build(etag)
+            data = self.data
+        return data[1:]
+
+
+reference_bundle = ReferenceBundle()
+
+
+def get_reference_etag():
+    return get_etag(*REFERENCE_VERSION_KEYS)
@@ -1,19 +1,19 @@
 import base64
 
-from django.shortcuts import get_object_or_404
 from django.core.files.base import ContentFile
 from django.db import transaction
-from django.db.utils import IntegrityError
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
-from api.base_serializers import ForWriteSeirlizer, FavoriteCartSerializer
+from api.base_serializers import ImageVariantsField
+from api.cart import refresh_recipe_carts
+from api.search import update_search_vectors
+from api.similar import schedule_similar
 from api.users.serializers import ApiUserSerializerForWrite
 from recipes.models import (Recipe,
                             Ingredient,
                             Tag,
-                            RecipeIngredient,
-                            FavoriteRecipe,
-                            ShoppingCartRecipe)
+                            RecipeIngredient)
 
 
 class Base64ImageField(serializers.ImageField):
@@ -35,8 +35,8 @@ class TagSerializer(serializers.ModelSerializer):
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
-        model = RecipeIngredient
-        fields = ('name', 'measurement_unit')
+        model = Ingredient
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class TagRecipeSerializerForWrite(serializers.ModelSerializer):
@@ -54,24 +54,59 @@ class IngredientRecipeSerializerForWrite(serializers.ModelSerializer):
         model = RecipeIngredient
         fields = ('id', 'amount')
 
-    def create(self, validated_data):
-        ingredient = validated_data.pop('id')
-        recipe = self.initial_data.pop('recipe')
-        recipe_ingredient = RecipeIngredient.objects.create(
-            recipe=recipe,
-            ingredient_id=ingredient,
-            **validated_data
+
+class IngredientRecipeSerializerForRead(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class RecipeDocumentSerializer(serializers.ModelSerializer):
+    """Часть представления рецепта, которая хранится в Recipe.document."""
+    tags = TagSerializer(many=True)
+    author = ApiUserSerializerForWrite(read_only=True)
+    ingredients = IngredientRecipeSerializerForRead(
+        source='recipe_ingredients',
+        many=True,
+        read_only=True
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('tags', 'author', 'ingredients')
+
+
+def get_document_prefetches():
+    return (
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
         )
-        return recipe_ingredient
+    )
+
+
+def update_recipe_document(recipe):
+    prefetch_related_objects([recipe], *get_document_prefetches())
+    recipe.document = RecipeDocumentSerializer(recipe).data
+    Recipe.objects.filter(pk=recipe.pk).update(document=recipe.document)
+    update_search_vectors([recipe.pk])
 
 
 class RecipeSerializerForRead(serializers.ModelSerializer):
     image = Base64ImageField()
-    ingredients = serializers.SerializerMethodField(
-        'get_ingredients_with_amount'
-    )
-    tags = TagSerializer(many=True)
-    author = ApiUserSerializerForWrite(read_only=True)
+    image_variants = ImageVariantsField()
+    # Тэги, автор и ингредиенты берутся из заранее собранного документа,
+    # запросы к связанным таблицам при чтении не выполняются
+    tags = serializers.SerializerMethodField()
+    author = serializers.SerializerMethodField()
+    ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.BooleanField(default=False)
     is_in_shopping_cart = serializers.BooleanField(default=False)
 
@@ -84,23 +119,26 @@ class RecipeSerializerForRead(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
             'is_favorited',
             'is_in_shopping_cart'
         )
 
-    def get_ingredients_with_amount(self, validated_data):
-        recipe = get_object_or_404(Recipe, pk=validated_data.id)
-        ingredients = recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            'recipe_ingredients__amount'
-        )
-        for item in ingredients:
-            item['amount'] = item.pop('recipe_ingredients__amount')
-        return ingredients
+    def get_document(self, instance):
+        if not instance.document:
+            instance.document = RecipeDocumentSerializer(instance).data
+        return instance.document
+
+    def get_tags(self, instance):
+        return self.get_document(instance)['tags']
+
+    def get_author(self, instance):
+        return self.get_document(instance)['author']
+
+    def get_ingredients(self, instance):
+        return self.get_document(instance)['ingredients']
 
 
 class RecipeSerializerForWrite(serializers.ModelSerializer):
@@ -126,22 +164,50 @@ class RecipeSerializerForWrite(serializers.ModelSerializer):
         )
 
     def validate(self, attrs):
-        if not attrs['ingredients']:
+        if 'ingredients' in attrs:
+            self.validate_ingredient_ids(attrs['ingredients'])
+        if 'tags' in self.initial_data:
+            self.validate_tag_ids(self.initial_data['tags'])
+        elif not self.partial:
             raise serializers.ValidationError(
-                'Поле ингредиентов обязательно к заполнению.'
+                'Поле тегов обязательно к заполнению.'
             )
-        for item in attrs['ingredients']:
-            if not Ingredient.objects.filter(id=item['id']).exists():
-                raise serializers.ValidationError(
-                    'Ингредиента не существует.'
-                )
-        for _ in self.initial_data['tags']:
-            if not Tag.objects.filter(id=_).exists():
-                raise serializers.ValidationError(
-                    'Тега не существует.'
-                )
         return attrs
 
+    def validate_ingredient_ids(self, ingredients):
+        if not ingredients:
+            raise serializers.ValidationError(
+                'Поле ингредиентов обязательно к заполнению.'
+            )
+        ingredient_ids = [item['id'] for item in ingredients]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.'
+            )
+        if Ingredient.objects.filter(
+            id__in=ingredient_ids
+        ).count() != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Ингредиента не существует.'
+            )
+
+    def validate_tag_ids(self, tags):
+        tag_ids = set(tags)
+        if Tag.objects.filter(id__in=tag_ids).count() != len(tag_ids):
+            raise serializers.ValidationError(
+                'Тега не существует.'
+            )
+
+    def create_ingredients(self, recipe, ingredients):
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=item['id'],
+                amount=item['amount']
+            )
+            for item in ingredients
+        )
+
     @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
@@ -150,87 +216,65 @@ class RecipeSerializerForWrite(serializers.ModelSerializer):
         # Тут не стал добавлять проверку на уникальность тегов,
         # так как с такой конструкцией при пост запросе одинаковых тегов
         # создаются только уникальные
-        try:
-            recipe.tags.set(tags)
-        except IntegrityError:
-            raise serializers.ValidationError(
-                'Тэга не существует.'
-            )
-        for ingredient in ingredients:
-            try:
-                ingredient['recipe'] = recipe
-                recipe_ingredient = IngredientRecipeSerializerForWrite(
-                    data=ingredient
-                )
-                recipe_ingredient.is_valid(raise_exception=True)
-                recipe_ingredient.save()
-            except IntegrityError:
-                raise serializers.ValidationError(
-                    'Ингредиенты не должны повторяться.'
-                )
+        recipe.tags.set(tags)
+        self.create_ingredients(recipe, ingredients)
+        update_recipe_document(recipe)
+        schedule_similar(recipe.pk)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        """
+        Применяет к ингредиентам рецепта только разницу с текущими.
+
+        Возвращает True, если изменился набор ингредиентов.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.all()
+        }
+        amounts = {item['id']: item['amount'] for item in ingredients}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id, item.amount)
+            if amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        added = [item for item in ingredients if item['id'] not in current]
+        self.create_ingredients(recipe, added)
+        affected = removed.union(
+            item.ingredient_id for item in changed
+        ).union(item['id'] for item in added)
+        if affected:
+            refresh_recipe_carts(recipe, affected)
+        return bool(removed or added)
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = self.initial_data.pop('tags')
-        Recipe.objects.filter(id=instance.pk).update(**validated_data)
-        recipe = get_object_or_404(Recipe, id=instance.pk)
-        recipe.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
-        for ingredient in ingredients:
-            try:
-                ingredient['recipe'] = recipe
-                recipe_ingredient = IngredientRecipeSerializerForWrite(
-                    data=ingredient
-                )
-                recipe_ingredient.is_valid(raise_exception=True)
-                recipe_ingredient.save()
-            except IntegrityError:
-                raise serializers.ValidationError(
-                    'Ингредиенты не должны повторяться.'
-                )
+        # Поля, которых нет в PATCH-запросе, остаются без изменений
+        ingredients = validated_data.pop('ingredients', None)
+        tags = self.initial_data.get('tags')
+        recipe = super().update(instance, validated_data)
+        # Похожие зависят только от наборов тэгов и ингредиентов
+        features_changed = False
+        if tags is not None:
+            current = set(recipe.tags.values_list('pk', flat=True))
+            features_changed = current != {int(pk) for pk in tags}
+            # set() сам удаляет только лишние связи и добавляет недостающие
+            recipe.tags.set(tags)
+        if ingredients is not None:
+            if self.update_ingredients(recipe, ingredients):
+                features_changed = True
+        update_recipe_document(recipe)
+        if features_changed:
+            schedule_similar(recipe.pk)
         return recipe
 
     def to_representation(self, instance):
         return RecipeSerializerForRead(instance=instance).data
-
-
-class FavoriteCartSerializerForWrite(ForWriteSeirlizer):
-    relation = serializers.PrimaryKeyRelatedField(read_only=True)
-    user = serializers.PrimaryKeyRelatedField(
-        read_only=True,
-        default=serializers.CurrentUserDefault()
-    )
-
-    class Meta:
-        model = None
-        fields = ('user', 'relation')
-
-    def validate(self, attrs):
-        attrs['user'] = self.context['request'].user
-        attrs['relation_id'] = self.context['relation_id']
-        return super().validate(attrs)
-
-    def create(self, validated_data):
-        try:
-            return super().create(validated_data)
-        except IntegrityError:
-            raise serializers.ValidationError('Рецепта не существует')
-
-    def to_representation(self, instance):
-        return FavoriteCartSerializer(
-            instance=Recipe.objects.get(
-                id=instance.relation_id
-            )
-        ).data
-
-
-class FavoriteSerializerForWrite(FavoriteCartSerializerForWrite):
-    class Meta(FavoriteCartSerializerForWrite.Meta):
-        model = FavoriteRecipe
-
-
-class CartSerializerForWrite(FavoriteCartSerializerForWrite):
-    class Meta(FavoriteCartSerializerForWrite.Meta):
-        model = ShoppingCartRecipe
@@ -4,6 +4,7 @@ from django.urls import include, path
 from .views import (RecipeViewSet,
                     IngredientViewSet,
                     TagViewSet,
+                    ReferenceView,
                     FavoriteRecipeViewSet,
                     ShoppingCartRecipeViewSet)
 
@@ -17,5 +18,6 @@ router_v1.register('ingredients', IngredientViewSet, basename='ingredient')
 router_v1.register('tags', TagViewSet, basename='tag')
 
 urlpatterns = [
+    path('reference/', ReferenceView.as_view(), name='reference'),
     path('', include(router_v1.urls)),
 ]
@@ -1,82 +1,178 @@
-from io import BytesIO
+from functools import partial
 
-from django.db.models import Value, Case, When, BooleanField
-from django.http import FileResponse
-from rest_framework import viewsets, mixins, filters, permissions
+from django.db.models import Exists, OuterRef, Value
+from django.http import (HttpResponse,
+                         HttpResponseNotModified,
+                         StreamingHttpResponse)
+from django.utils.cache import patch_vary_headers
+from django.utils.http import content_disposition_header
+from rest_framework import viewsets, mixins, filters, permissions, status
 from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 
+from api.cache import (INGREDIENTS_VERSION_KEY,
+                       TAGS_VERSION_KEY,
+                       AnonymousCacheMixin,
+                       ETagMixin,
+                       get_cache,
+                       is_not_modified)
+from api.cart import (CART_EXPORT_FORMATS,
+                      CART_FILENAME,
+                      CartExportNegotiation,
+                      cache_chunks,
+                      get_export_cache_key)
+from api.constants import INGREDIENTS_SEARCH_LIMIT, REFERENCE_CACHE_MAX_AGE
+from api.feed import get_feed_page, get_pulled_author_ids
+from api.base_serializers import FavoriteCartSerializer
 from api.filters import IngredientSearchFilter, RecipeSearchFilter
 from api.permissions import IsAuthenticatedOrReadOnly, IsAuthor
+from api.throttling import ConcurrencyGateMixin
 from api.paginators import LimitParamPagination
-from api.methods import (detail_post_method,
+from api.methods import (batch_delete_method,
+                         batch_post_method,
+                         detail_post_method,
                          detail_delete_method,
-                         get_cart_list)
+                         get_cart_items)
 from recipes.models import (Recipe,
+                            FeedEntry,
                             Ingredient,
                             Tag,
                             FavoriteRecipe,
                             ShoppingCartRecipe,)
+from .ingredient_index import ingredient_index
+from .reference import get_reference_etag, reference_bundle
 from .serializers import (RecipeSerializerForRead,
                           IngredientSerializer,
                           TagSerializer,
-                          RecipeSerializerForWrite,
-                          FavoriteSerializerForWrite,
-                          FavoriteCartSerializer,
-                          CartSerializerForWrite)
+                          RecipeSerializerForWrite)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ETagMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
+    etag_version_keys = (INGREDIENTS_VERSION_KEY,)
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = IngredientSearchFilter
     ordering_fields = ('name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(self.search, request)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    def search(self, request):
+        # Поиск обслуживается индексом в памяти без обращения к БД
+        return HttpResponse(
+            ingredient_index.search(
+                request.query_params.get('name', ''),
+                INGREDIENTS_SEARCH_LIMIT
+            ),
+            content_type='application/json'
+        )
+
+
+class TagViewSet(ETagMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
+    etag_version_keys = (TAGS_VERSION_KEY,)
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().annotate(
-        is_favorited=Value(False),
-        is_in_shopping_cart=Value(False)
-    ).order_by('-created_at')
+class ReferenceView(APIView):
+    """Тэги и ингредиенты одним сжатым ответом со строгим ETag."""
+    permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
+
+    def get(self, request):
+        version = get_reference_etag()
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        # Строгий ETag различается для разных Content-Encoding
+        etag = f'{version[:-1]}-gzip"' if compress else version
+        if is_not_modified(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            content, compressed = reference_bundle.get(version)
+            if compress:
+                response = HttpResponse(
+                    compressed, content_type='application/json'
+                )
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(
+                    content, content_type='application/json'
+                )
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f'public, max-age={REFERENCE_CACHE_MAX_AGE}'
+        )
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+def get_user_flags(user, recipe='pk'):
+    """Аннотации is_favorited и is_in_shopping_cart для рецепта recipe."""
+    if not user.is_authenticated:
+        return {
+            'is_favorited': Value(False),
+            'is_in_shopping_cart': Value(False)
+        }
+    # Коррелированные EXISTS по уникальным индексам (user, relation)
+    # не размножают строки рецепта, поэтому distinct не нужен
+    return {
+        'is_favorited': Exists(
+            FavoriteRecipe.objects.filter(
+                user=user,
+                relation=OuterRef(recipe)
+            )
+        ),
+        'is_in_shopping_cart': Exists(
+            ShoppingCartRecipe.objects.filter(
+                user=user,
+                relation=OuterRef(recipe)
+            )
+        )
+    }
+
+
+class RecipeViewSet(ConcurrencyGateMixin,
+                    AnonymousCacheMixin,
+                    viewsets.ModelViewSet):
+    # Автор, тэги и ингредиенты читаются из Recipe.document,
+    # вживую вычисляются только флаги текущего пользователя
+    # Поисковый вектор нужен только для фильтрации и ранжирования в БД
+    queryset = Recipe.objects.defer('search_vector').order_by(
+        '-created_at', '-id'
+    )
     serializer_class = RecipeSerializerForRead
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = LimitParamPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeSearchFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
+    throttle_scopes = {
+        'create': 'recipe_write',
+        'partial_update': 'recipe_write',
+        'download_shopping_cart': 'cart_export',
+    }
+
+    @property
+    def cursor_ordering(self):
+        # Курсор по результатам поиска сохраняет порядок по релевантности
+        if self.action != 'feed' and self.request.query_params.get(
+            'search', ''
+        ).strip():
+            return ('-search_rank', '-created_at', '-id')
+        return LimitParamPagination.cursor_ordering
 
     def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return self.queryset
-        queryset = Recipe.objects.all().annotate(
-            is_favorited=Case(
-                When(
-                    favoriterecipe__user__exact=self.request.user.id,
-                    then=Value(True)
-                ),
-                default=Value(False),
-                output_field=BooleanField()
-            ),
-            is_in_shopping_cart=Case(
-                When(
-                    shoppingcartrecipe__user__exact=self.request.user.id,
-                    then=Value(True)
-                ),
-                default=Value(False),
-                output_field=BooleanField()
-            )
-        ).order_by('id')
-        return queryset
+        return super().get_queryset().annotate(
+            **get_user_flags(self.request.user)
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -96,13 +192,71 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         methods=['GET'],
         detail=False,
-        url_path='download_shopping_cart',
+        url_path='feed',
         permission_classes=[permissions.IsAuthenticated]
     )
+    def feed(self, request):
+        user = request.user
+        recipes = self.filter_queryset(self.get_queryset())
+        entries = FeedEntry.objects.filter(user=user).select_related(
+            'recipe'
+        ).defer('recipe__search_vector').annotate(
+            **get_user_flags(user, 'recipe')
+        )
+        if recipes.query.has_filters():
+            # Фильтры по тэгам, автору и флагам сужают ленту подзапросом
+            entries = entries.filter(recipe__in=recipes.values('pk'))
+        pulled = get_pulled_author_ids(user)
+        pulled = recipes.filter(author__in=pulled) if pulled else None
+        page = self.paginator.paginate_cursor(
+            partial(get_feed_page, entries, pulled), request, self
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        # Соседи рецепта заранее сохранены в SimilarRecipe
+        recipe = self.get_object()
+        queryset = self.get_queryset().filter(
+            similar_to__recipe=recipe
+        ).order_by('-similar_to__score', '-id')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='download_shopping_cart',
+        permission_classes=[permissions.IsAuthenticated],
+        content_negotiation_class=CartExportNegotiation
+    )
     def download_shopping_cart(self, request):
-        result = get_cart_list(self.request.user)
-        buffer = BytesIO(str.encode(result))
-        return FileResponse(buffer, filename='test.txt', as_attachment=True)
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in CART_EXPORT_FORMATS:
+            return Response(
+                'Доступные форматы: ' + ', '.join(CART_EXPORT_FORMATS),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        render, content_type = CART_EXPORT_FORMATS[export_format]
+        headers = {
+            'Content-Disposition': content_disposition_header(
+                True, f'{CART_FILENAME}.{export_format}'
+            )
+        }
+        # Выгрузка кэшируется до следующего изменения корзины
+        key = get_export_cache_key(request.user, export_format)
+        content = get_cache().get(key)
+        if content is not None:
+            return HttpResponse(
+                content, content_type=content_type, headers=headers
+            )
+        items = get_cart_items(request.user).iterator()
+        return StreamingHttpResponse(
+            cache_chunks(key, render(items)),
+            content_type=content_type,
+            headers=headers
+        )
 
 
 class FavoriteCartViewSet(mixins.CreateModelMixin,
@@ -111,11 +265,6 @@ class FavoriteCartViewSet(mixins.CreateModelMixin,
     queryset = Recipe.objects.all()
     serializer_class = FavoriteCartSerializer
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context.update({'relation_id': self.kwargs['pk']})
-        return context
-
 
 class FavoriteRecipeViewSet(FavoriteCartViewSet):
     model_name = FavoriteRecipe
@@ -123,11 +272,6 @@ class FavoriteRecipeViewSet(FavoriteCartViewSet):
     def get_queryset(self):
         return Recipe.objects.filter(favoriterecipe__user=self.request.user)
 
-    def get_serializer_class(self):
-        if self.request.method not in permissions.SAFE_METHODS:
-            return FavoriteSerializerForWrite
-        return FavoriteCartSerializer
-
     @action(
         methods=['POST'],
         detail=True,
@@ -140,6 +284,18 @@ class FavoriteRecipeViewSet(FavoriteCartViewSet):
     def delete_favorite(self, request, pk):
         return detail_delete_method(self, request, self.kwargs['pk'])
 
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='favorite/batch'
+    )
+    def add_batch_to_favorites(self, request):
+        return batch_post_method(self, request)
+
+    @add_batch_to_favorites.mapping.delete
+    def delete_batch_from_favorites(self, request):
+        return batch_delete_method(self, request)
+
 
 class ShoppingCartRecipeViewSet(FavoriteCartViewSet):
     model_name = ShoppingCartRecipe
@@ -149,11 +305,6 @@ class ShoppingCartRecipeViewSet(FavoriteCartViewSet):
             shoppingcartrecipe__user=self.request.user
         )
 
-    def get_serializer_class(self):
-        if self.request.method not in permissions.SAFE_METHODS:
-            return CartSerializerForWrite
-        return FavoriteCartSerializer
-
     @action(
         methods=['POST'],
         detail=True,
@@ -165,3 +316,15 @@ class ShoppingCartRecipeViewSet(FavoriteCartViewSet):
     @add_to_cart.mapping.delete
     def delete_favorite(self, request, pk):
         return detail_delete_method(self, request, self.kwargs['pk'])
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='shopping_cart/batch'
+    )
+    def add_batch_to_cart(self, request):
+        return batch_post_method(self, request)
+
+    @add_batch_to_cart.mapping.delete
+    def delete_batch_from_cart(self, request):
+        return batch_delete_method(self, request)
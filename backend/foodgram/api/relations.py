@@ -0,0 +1,96 @@
+"""
+Изменения избранного, корзины и подписок.
+
+Связи пишутся одним запросом с RETURNING без сигналов моделей, поэтому
+счётчики, агрегат корзины и ленты обновляются здесь сразу для всех
+созданных или удалённых связей.
+"""
+from django.db import connection, transaction
+
+from api.cart import refresh_cart_ingredients
+from api.counters import COUNTERS, change_counter
+from api.feed import follow_authors, unfollow_authors
+from recipes.models import RecipeIngredient, ShoppingCartRecipe
+from users.models import Subscription
+
+
+def sync_relations(model, user_id, relation_ids, delta):
+    """Обновляет данные, зависящие от добавленных или удалённых связей."""
+    if not relation_ids:
+        return
+    for counter_model, field, _ in COUNTERS[model]:
+        change_counter(counter_model, field, relation_ids, delta)
+    if model is ShoppingCartRecipe:
+        refresh_cart_ingredients(
+            [user_id],
+            RecipeIngredient.objects.filter(
+                recipe__in=relation_ids
+            ).values_list('ingredient_id', flat=True).distinct()
+        )
+    elif model is Subscription:
+        if delta > 0:
+            follow_authors(user_id, relation_ids)
+        else:
+            unfollow_authors(user_id, relation_ids)
+
+
+def get_columns(model):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field('relation').column)
+    )
+
+
+def insert_relations(model, user_id, relation_ids):
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING: возвращает id только
+    тех связей, которые действительно были созданы этим запросом.
+    """
+    if not relation_ids:
+        return []
+    table, user_column, relation_column = get_columns(model)
+    values = ', '.join(['(%s, %s)'] * len(relation_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {relation_column}) '
+            f'VALUES {values} ON CONFLICT DO NOTHING '
+            f'RETURNING {relation_column}',
+            [value for pk in relation_ids for value in (user_id, pk)]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_relations(model, user_id, relation_ids):
+    """DELETE ... RETURNING: возвращает id удалённых связей."""
+    if not relation_ids:
+        return []
+    table, user_column, relation_column = get_columns(model)
+    placeholders = ', '.join(['%s'] * len(relation_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {relation_column} IN ({placeholders}) '
+            f'RETURNING {relation_column}',
+            [user_id, *relation_ids]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+@transaction.atomic
+def add_relations(model, user_id, relation_ids):
+    """Создаёт связи пользователя и возвращает id созданных."""
+    created = set(insert_relations(model, user_id, relation_ids))
+    created = [pk for pk in relation_ids if pk in created]
+    sync_relations(model, user_id, created, 1)
+    return created
+
+
+@transaction.atomic
+def remove_relations(model, user_id, relation_ids):
+    """Удаляет связи пользователя и возвращает id удалённых."""
+    deleted = set(delete_relations(model, user_id, relation_ids))
+    deleted = [pk for pk in relation_ids if pk in deleted]
+    sync_relations(model, user_id, deleted, -1)
+    return deleted
@@ -0,0 +1,116 @@
+"""
+Полнотекстовый поиск рецептов.
+
+В PostgreSQL поиск идёт по хранимому tsvector из названия, ингредиентов
+и описания с индексом GIN, результаты упорядочены по ts_rank. Вектор
+пересобирается вместе с документом рецепта. В остальных СУБД поиск
+сводится к поиску подстроки по тем же полям без учёта регистра.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery,
+                                            SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Case, Exists, F, FloatField, Func, OuterRef,
+                              Q, Subquery, TextField, Value, When)
+from django.db.models.functions import Cast, Coalesce
+
+from api.constants import SEARCH_CONFIG
+from recipes.models import Recipe, RecipeIngredient
+
+
+def is_full_text():
+    return connection.vendor == 'postgresql'
+
+
+class Casefold(Func):
+    """
+    Текст в нижнем регистре.
+
+    LOWER в SQLite понимает только ASCII, поэтому там вызывается
+    функция Python, которую register_casefold добавляет в соединение.
+    """
+    function = 'LOWER'
+    output_field = TextField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, function='PY_LOWER', **extra_context
+        )
+
+
+def casefold(value):
+    return None if value is None else value.lower()
+
+
+def register_casefold(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'PY_LOWER', 1, casefold, deterministic=True
+        )
+
+
+def get_search_vector():
+    """Вектор рецепта: название важнее ингредиентов, ингредиенты — текста."""
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(
+                ingredient_names, Value(''), output_field=TextField()
+            ),
+            weight='B',
+            config=SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(pks):
+    if is_full_text() and pks:
+        Recipe.objects.filter(pk__in=pks).update(
+            search_vector=get_search_vector()
+        )
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос, от более к менее релевантным."""
+    # Ранг сравнивается с границей курсора, поэтому считается в double
+    # precision: float4 из ts_rank не равен своему десятичному виду
+    if is_full_text():
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(
+                SearchRank(F('search_vector'), query), FloatField()
+            )
+        ).order_by('-search_rank', '-created_at', '-id')
+    # Каждое слово должно найтись в названии, описании или ингредиентах
+    value = value.lower()
+    queryset = queryset.alias(
+        name_lower=Casefold('name'), text_lower=Casefold('text')
+    )
+    for word in value.split():
+        queryset = queryset.filter(
+            Q(name_lower__contains=word)
+            | Q(text_lower__contains=word)
+            | Exists(
+                RecipeIngredient.objects.alias(
+                    name_lower=Casefold('ingredient__name')
+                ).filter(recipe=OuterRef('pk'), name_lower__contains=word)
+            )
+        )
+    return queryset.annotate(
+        search_rank=Case(
+            When(name_lower__contains=value, then=Value(1.0)),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+    ).order_by('-search_rank', '-created_at', '-id')
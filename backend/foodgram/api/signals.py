@@ -0,0 +1,216 @@
+from django.db.models.signals import (m2m_changed,
+                                      post_delete,
+                                      post_save,
+                                      pre_delete,
+                                      pre_save)
+from django.db import transaction
+from django.dispatch import receiver
+
+from api.cache import (INGREDIENTS_VERSION_KEY,
+                       TAGS_VERSION_KEY,
+                       bump_version,
+                       invalidate,
+                       invalidate_tag_ids)
+from api.cart import (get_recipe_ingredient_ids,
+                      invalidate_ingredient_carts,
+                      refresh_cart_ingredients)
+from api.counters import update_counters
+from api.feed import fan_out_recipe, follow_authors, unfollow_authors
+from api.recipes.documents import rebuild_documents
+from api.recipes.images import schedule_variants
+from recipes.models import (FavoriteRecipe,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCartRecipe,
+                            Tag)
+from users.models import ApiUser, Subscription
+
+AUTHOR_DOCUMENT_FIELDS = {'email', 'first_name', 'last_name', 'username'}
+"""Поля автора, которые попадают в документ рецепта."""
+
+
+# Документы пересобираются раньше сброса кэша ответов,
+# поэтому обработчики ниже объявлены первыми
+@receiver(post_save, sender=Tag)
+def rebuild_documents_for_tag(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_documents(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def rebuild_documents_for_ingredient(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_documents(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(pre_save, sender=ApiUser)
+def remember_author_changes(sender, instance, update_fields, **kwargs):
+    # Вход, смена пароля и другие поля автора в рецепты не попадают
+    instance.author_fields_changed = False
+    if instance._state.adding or (
+        update_fields and not AUTHOR_DOCUMENT_FIELDS & set(update_fields)
+    ):
+        return
+    saved = ApiUser.objects.filter(pk=instance.pk).values(
+        *AUTHOR_DOCUMENT_FIELDS
+    ).first()
+    instance.author_fields_changed = saved is not None and any(
+        getattr(instance, field) != value for field, value in saved.items()
+    )
+
+
+@receiver(post_save, sender=ApiUser)
+def rebuild_documents_for_author(sender, instance, **kwargs):
+    if instance.author_fields_changed:
+        rebuild_documents(Recipe.objects.filter(author=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_for_documents(sender, instance, **kwargs):
+    # После удаления связи с рецептами уже не найти
+    relation = 'tags' if sender is Tag else 'ingredients'
+    instance.document_recipe_ids = list(
+        Recipe.objects.filter(
+            **{relation: instance}
+        ).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def rebuild_documents_after_delete(sender, instance, **kwargs):
+    rebuild_documents(
+        Recipe.objects.filter(pk__in=instance.document_recipe_ids)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def build_image_variants(sender, instance, **kwargs):
+    name = instance.image.name
+    if name and instance.image_variants.get('source') != name:
+        # Копии строятся после коммита, когда файл и рецепт уже сохранены
+        transaction.on_commit(lambda: schedule_variants(instance.pk, name))
+
+
+@receiver(post_save, sender=ShoppingCartRecipe)
+def add_to_cart_ingredients(sender, instance, **kwargs):
+    refresh_cart_ingredients(
+        [instance.user_id], get_recipe_ingredient_ids(instance.relation_id)
+    )
+
+
+@receiver(pre_delete, sender=ShoppingCartRecipe)
+def remember_cart_ingredients(sender, instance, **kwargs):
+    # При каскадном удалении рецепта его ингредиенты удаляются
+    # раньше post_delete, поэтому список запоминается заранее
+    instance.cart_ingredient_ids = get_recipe_ingredient_ids(
+        instance.relation_id
+    )
+
+
+@receiver(post_delete, sender=ShoppingCartRecipe)
+def remove_from_cart_ingredients(sender, instance, **kwargs):
+    refresh_cart_ingredients(
+        [instance.user_id], instance.cart_ingredient_ids
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_carts_for_ingredient(sender, instance, created, **kwargs):
+    # Название и единица измерения попадают в выгрузку списка покупок
+    if not created:
+        invalidate_ingredient_carts(instance)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def invalidate_carts_before_delete(sender, instance, **kwargs):
+    # После каскадного удаления корзины с ингредиентом уже не найти
+    invalidate_ingredient_carts(instance)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCartRecipe)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscription)
+def increment_counters(sender, instance, created, **kwargs):
+    if created:
+        update_counters(instance, 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCartRecipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscription)
+def decrement_counters(sender, instance, **kwargs):
+    update_counters(instance, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def add_author_to_feed(sender, instance, created, **kwargs):
+    if created:
+        follow_authors(instance.user_id, [instance.relation_id])
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_author_from_feed(sender, instance, **kwargs):
+    unfollow_authors(instance.user_id, [instance.relation_id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reset_tag_ids(sender, **kwargs):
+    # Карта тэгов пересобирается только по закоммиченным данным
+    transaction.on_commit(reset_tag_caches)
+
+
+def reset_tag_caches():
+    invalidate_tag_ids()
+    bump_version(TAGS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    # До коммита другой запрос загрузил бы под новой версией старые данные
+    transaction.on_commit(lambda: bump_version(INGREDIENTS_VERSION_KEY))
+
+
+def invalidate_after_commit():
+    # Сброшенный до коммита кэш мог бы заполниться старыми данными
+    # под новым поколением ключей
+    transaction.on_commit(invalidate)
+
+
+# Ингредиенты и авторы тоже попадают в ответ, поэтому
+# их изменения также сбрасывают кэш. Удаление автора сбрасывает
+# кэш через каскадное удаление его рецептов
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipes_cache(sender, **kwargs):
+    invalidate_after_commit()
+
+
+@receiver(post_save, sender=ApiUser)
+def invalidate_recipes_cache_for_author(sender, instance, **kwargs):
+    if instance.author_fields_changed:
+        invalidate_after_commit()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_cache_on_tags(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_after_commit()
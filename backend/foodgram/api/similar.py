@@ -0,0 +1,223 @@
+"""
+Похожие рецепты.
+
+Рецепт представлен вектором из ингредиентов и тэгов (с меньшим весом),
+близость двух рецептов — косинус между их векторами. Похожими считаются
+только рецепты с общими ингредиентами. Для каждого рецепта заранее
+сохраняются SIMILAR_RECIPES_LIMIT ближайших соседей: все списки целиком
+пересобирает команда rebuild_similar_recipes, а при записи рецепта
+пересчитываются только его список и его место в списках соседей.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Window
+from django.db.models.functions import RowNumber
+from scipy import sparse
+
+from api.background import BackgroundExecutor
+from api.constants import (SIMILAR_BATCH_SIZE,
+                           SIMILAR_RECIPES_LIMIT,
+                           SIMILAR_TAG_WEIGHT)
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+
+executor = BackgroundExecutor(
+    'similar-recipes',
+    settings.SIMILAR_RECIPES_WORKERS,
+    settings.SIMILAR_RECIPES_MAX_PENDING
+)
+
+
+def build_matrix(recipe_ids, pairs):
+    """
+    Бинарная разреженная матрица рецепт × признак из пар (рецепт, признак).
+
+    Строки идут в порядке отсортированного массива recipe_ids.
+    """
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    rows = np.searchsorted(recipe_ids, pairs[:, 0])
+    features, columns = np.unique(pairs[:, 1], return_inverse=True)
+    return sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(recipe_ids), len(features))
+    )
+
+
+def get_neighbours(ingredients, tags, rows, limit):
+    """
+    Ближайшие соседи рецептов из строк rows по убыванию близости.
+
+    Возвращает номера строк соседей и близость, по limit на рецепт.
+    Нулевая близость означает, что похожих рецептов меньше limit.
+    """
+    weight = SIMILAR_TAG_WEIGHT ** 2
+    # Тэгов мало, поэтому их матрица плотная и умножается через BLAS
+    tags = tags.toarray()
+    norms = np.sqrt(ingredients.getnnz(axis=1) + weight * tags.sum(axis=1))
+    norms[norms == 0] = 1
+    inverse = (1 / norms).astype(np.float32)
+    shared = (ingredients[rows] @ ingredients.T).toarray()
+    scores = (weight * tags[rows]) @ tags.T
+    scores += shared
+    scores[shared == 0] = 0
+    scores *= inverse
+    scores *= inverse[rows, None]
+    scores[np.arange(len(rows)), rows] = 0
+    limit = min(limit, scores.shape[1])
+    if not limit:
+        return (
+            np.empty((len(rows), 0), dtype=np.int64),
+            np.empty((len(rows), 0), dtype=np.float32)
+        )
+    # Частичная сортировка отбирает limit лучших, полная — только их
+    top = np.argpartition(scores, -limit, axis=1)[:, -limit:]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return (
+        np.take_along_axis(top, order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1)
+    )
+
+
+def load_features(recipes=None):
+    """Id рецептов по возрастанию и их матрицы ингредиентов и тэгов."""
+    ingredient_pairs = RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    )
+    tag_pairs = Recipe.tags.through.objects.values_list('recipe_id', 'tag_id')
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    else:
+        ingredient_pairs = ingredient_pairs.filter(recipe__in=recipes)
+        tag_pairs = tag_pairs.filter(recipe__in=recipes)
+    recipe_ids = np.array(
+        sorted(recipes.values_list('pk', flat=True)), dtype=np.int64
+    )
+    return (
+        recipe_ids,
+        build_matrix(recipe_ids, list(ingredient_pairs)),
+        build_matrix(recipe_ids, list(tag_pairs))
+    )
+
+
+def get_entries(recipe_ids, rows, neighbours, scores):
+    return [
+        SimilarRecipe(
+            recipe_id=recipe_ids[row],
+            similar_id=recipe_ids[neighbour],
+            score=score
+        )
+        for row, row_neighbours, row_scores in zip(
+            rows.tolist(), neighbours.tolist(), scores.tolist()
+        )
+        for neighbour, score in zip(row_neighbours, row_scores)
+        if score > 0
+    ]
+
+
+@transaction.atomic
+def rebuild_similar(batch_size=SIMILAR_BATCH_SIZE):
+    """Пересобирает списки похожих для всех рецептов, возвращает их число."""
+    recipe_ids, ingredients, tags = load_features()
+    recipe_ids = recipe_ids.tolist()
+    SimilarRecipe.objects.all().delete()
+    for start in range(0, len(recipe_ids), batch_size):
+        rows = np.arange(start, min(start + batch_size, len(recipe_ids)))
+        neighbours, scores = get_neighbours(
+            ingredients, tags, rows, SIMILAR_RECIPES_LIMIT
+        )
+        SimilarRecipe.objects.bulk_create(
+            get_entries(recipe_ids, rows, neighbours, scores)
+        )
+    return len(recipe_ids)
+
+
+def trim_similar(recipe_ids):
+    """Удаляет из списков похожих записи сверх SIMILAR_RECIPES_LIMIT."""
+    overflow = SimilarRecipe.objects.filter(recipe__in=recipe_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('recipe'),
+            order_by=(F('score').desc(), F('similar').desc())
+        )
+    ).filter(
+        position__gt=SIMILAR_RECIPES_LIMIT
+    ).values_list('pk', flat=True)
+    overflow = list(overflow)
+    if overflow:
+        SimilarRecipe.objects.filter(pk__in=overflow).delete()
+
+
+@transaction.atomic
+def update_similar(recipe_id):
+    """
+    Пересчитывает похожие для изменённого рецепта.
+
+    Сравнение идёт только с рецептами, у которых есть общие с ним
+    ингредиенты. Близость симметрична, поэтому та же строка матрицы
+    определяет место рецепта в списках его соседей. Если рецепт выпал
+    из чужого списка, тот остаётся короче до полной пересборки.
+    """
+    SimilarRecipe.objects.filter(
+        Q(recipe=recipe_id) | Q(similar=recipe_id)
+    ).delete()
+    candidates = Recipe.objects.filter(
+        Q(pk=recipe_id) | Q(
+            pk__in=RecipeIngredient.objects.filter(
+                ingredient__in=RecipeIngredient.objects.filter(
+                    recipe=recipe_id
+                ).values('ingredient')
+            ).values('recipe')
+        )
+    )
+    recipe_ids, ingredients, tags = load_features(candidates)
+    if recipe_id not in recipe_ids:
+        return
+    row = np.searchsorted(recipe_ids, recipe_id)
+    neighbours, scores = get_neighbours(
+        ingredients, tags, np.array([row]), len(recipe_ids)
+    )
+    recipe_ids = recipe_ids.tolist()
+    scores = {
+        recipe_ids[neighbour]: score
+        for neighbour, score in zip(neighbours[0].tolist(), scores[0].tolist())
+        if score > 0
+    }
+    entries = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=pk, score=score)
+        for pk, score in list(scores.items())[:SIMILAR_RECIPES_LIMIT]
+    ]
+    lists = SimilarRecipe.objects.filter(
+        recipe__in=scores
+    ).order_by().values('recipe').annotate(
+        size=Count('pk'), worst=Min('score')
+    ).values_list('recipe', 'size', 'worst')
+    lists = {pk: (size, worst) for pk, size, worst in lists}
+    extended = []
+    for pk, score in scores.items():
+        size, worst = lists.get(pk, (0, 0))
+        if size < SIMILAR_RECIPES_LIMIT or score > worst:
+            entries.append(
+                SimilarRecipe(recipe_id=pk, similar_id=recipe_id, score=score)
+            )
+            extended.append(pk)
+    SimilarRecipe.objects.bulk_create(entries)
+    trim_similar(extended)
+
+
+def submit_similar(recipe_id):
+    if not settings.SIMILAR_RECIPES_ASYNC:
+        update_similar(recipe_id)
+        return
+    executor.submit(update_similar, recipe_id)
+
+
+def schedule_similar(recipe_id):
+    """
+    Ставит пересчёт похожих в пул потоков после коммита, когда
+    ингредиенты и тэги рецепта уже сохранены.
+
+    При переполненной очереди задача отбрасывается, такие рецепты
+    догоняет команда rebuild_similar_recipes.
+    """
+    transaction.on_commit(lambda: submit_similar(recipe_id))
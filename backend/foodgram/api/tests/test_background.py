@@ -0,0 +1,37 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from api.background import BackgroundExecutor
+
+
+class BackgroundExecutorTests(SimpleTestCase):
+
+    def setUp(self):
+        self.executor = BackgroundExecutor('test', 1, 1)
+
+    def tearDown(self):
+        self.executor.get_executor().shutdown(wait=True)
+
+    def test_overflow_is_dropped(self):
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        with self.assertLogs('api.background', 'WARNING'):
+            self.assertTrue(self.executor.submit(block))
+            started.wait(5)
+            self.assertFalse(self.executor.submit(block))
+        release.set()
+
+    def test_failure_is_logged_and_frees_slot(self):
+        def fail():
+            raise ValueError
+
+        with self.assertLogs('api.background', 'ERROR') as logs:
+            self.assertTrue(self.executor.submit(fail))
+            self.executor.get_executor().shutdown(wait=True)
+        self.assertIn('fail', logs.output[0])
+        self.assertTrue(self.executor.pending.acquire(blocking=False))
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import (Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCartRecipe)
+from users.models import ApiUser
+
+EXPORT_URL = '/api/recipes/download_shopping_cart/'
+
+
+class CartExportTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = ApiUser.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='Свёкла', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            author=self.user,
+            name='Борщ',
+            text='Суп',
+            image='recipes/image.jpg',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.ingredient, amount=100
+        )
+        ShoppingCartRecipe.objects.create(user=self.user, relation=recipe)
+        self.client.force_authenticate(self.user)
+
+    def export(self):
+        response = self.client.get(EXPORT_URL, {'format': 'txt'})
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        return response.content.decode()
+
+    def test_ingredient_change_invalidates_export(self):
+        self.assertIn('Свёкла', self.export())
+        self.ingredient.name = 'Буряк'
+        self.ingredient.measurement_unit = 'кг'
+        self.ingredient.save()
+        content = self.export()
+        self.assertIn('Буряк', content)
+        self.assertIn('кг', content)
+
+    def test_user_save_keeps_cart_version(self):
+        user = ApiUser.objects.get(pk=self.user.pk)
+        self.export()
+        ShoppingCartRecipe.objects.filter(user=self.user).delete()
+        user.first_name = 'Повар'
+        user.save()
+        self.assertNotIn('Свёкла', self.export())
@@ -0,0 +1,45 @@
+from django.db.models import F
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+from users.models import ApiUser
+
+
+class DerivedFieldsTests(APITestCase):
+
+    def setUp(self):
+        self.user = ApiUser.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='Борщ',
+            text='Суп',
+            image='recipes/image.jpg',
+            cooking_time=10
+        )
+
+    def test_recipe_save_keeps_concurrent_changes(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=F('favorites_count') + 1,
+            image_variants={'source': 'recipes/image.jpg'}
+        )
+        recipe.name = 'Щи'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Щи')
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.image_variants['source'], 'recipes/image.jpg')
+
+    def test_user_save_keeps_counters(self):
+        user = ApiUser.objects.get(pk=self.user.pk)
+        ApiUser.objects.filter(pk=user.pk).update(
+            followers_count=F('followers_count') + 2
+        )
+        user.set_password('new-password')
+        user.save()
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('new-password'))
+        self.assertEqual(user.followers_count, 2)
+        self.assertEqual(user.recipes_count, 1)
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from api.recipes.documents import rebuild_documents
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import ApiUser
+
+RECIPES_URL = '/api/recipes/'
+
+
+class RecipeSearchTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = ApiUser.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        beet = Ingredient.objects.create(name='Свёкла', measurement_unit='г')
+        cls.borscht = [
+            cls.create_recipe('Борщ', 'Суп на говяжьем бульоне')
+            for _ in range(5)
+        ]
+        RecipeIngredient.objects.create(
+            recipe=cls.borscht[0], ingredient=beet, amount=100
+        )
+        cls.salad = cls.create_recipe('Винегрет', 'Почти как борщ, но салат')
+        cls.create_recipe('Каша', 'Гречневая')
+        rebuild_documents()
+
+    @classmethod
+    def create_recipe(cls, name, text):
+        return Recipe.objects.create(
+            author=cls.user,
+            name=name,
+            text=text,
+            image='recipes/image.jpg',
+            cooking_time=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def search(self, value, **params):
+        response = self.client.get(
+            RECIPES_URL, {'search': value, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_search_ignores_case_of_cyrillic(self):
+        for value in ('борщ', 'БОРЩ', 'Борщ'):
+            with self.subTest(value=value):
+                names = [
+                    recipe['name'] for recipe in self.search(value)['results']
+                ]
+                self.assertEqual(names.count('Борщ'), 5)
+                self.assertNotIn('Каша', names)
+
+    def test_search_by_ingredient(self):
+        results = self.search('свёкла')['results']
+        self.assertEqual(
+            [recipe['id'] for recipe in results], [self.borscht[0].pk]
+        )
+
+    def test_name_match_ranks_above_text_match(self):
+        results = self.search('борщ')['results']
+        self.assertEqual(results[-1]['id'], self.salad.pk)
+
+    def test_cursor_pages_through_equal_ranks(self):
+        expected = [recipe.pk for recipe in reversed(self.borscht)]
+        expected.append(self.salad.pk)
+        page = self.search('борщ', cursor='', limit=2)
+        seen = []
+        while True:
+            seen.extend(recipe['id'] for recipe in page['results'])
+            if not page['next']:
+                break
+            page = self.client.get(page['next']).json()
+        self.assertEqual(seen, expected)
+        previous = self.client.get(page['previous']).json()
+        self.assertEqual(
+            [recipe['id'] for recipe in previous['results']], expected[2:4]
+        )
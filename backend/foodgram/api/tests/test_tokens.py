@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.users.tokens import ApiRefreshToken
+from users.models import ApiUser
+
+LOGOUT_URL = '/api/auth/jwt/logout/'
+REFRESH_URL = '/api/auth/jwt/refresh/'
+
+
+class DestroyJWTTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = ApiUser.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        self.refresh = ApiRefreshToken.for_user(self.user)
+
+    def test_missing_refresh_is_rejected(self):
+        for data in ({}, {'refresh': ''}, {'refresh': 1}):
+            with self.subTest(data=data):
+                response = self.client.post(LOGOUT_URL, data, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_logout_denies_tokens(self):
+        access = str(self.refresh.access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = self.client.post(
+            LOGOUT_URL, {'refresh': str(self.refresh)}, format='json'
+        )
+        self.assertEqual(response.status_code, 204)
+        response = self.client.post(
+            REFRESH_URL, {'refresh': str(self.refresh)}, format='json'
+        )
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_with_drf_token(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.post(
+            LOGOUT_URL, {'refresh': str(self.refresh)}, format='json'
+        )
+        self.assertEqual(response.status_code, 204)
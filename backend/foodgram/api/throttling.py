@@ -0,0 +1,122 @@
+"""Ограничение частоты и числа одновременных дорогих запросов."""
+import random
+import time
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import ScopedRateThrottle
+
+from api.cache import get_cache
+
+GATE_KEY = 'gate:{}:{}'
+
+
+def get_scope(view):
+    """Область ограничений: своя у действия вьюсета или общая у вьюхи."""
+    scopes = getattr(view, 'throttle_scopes', {})
+    return scopes.get(
+        getattr(view, 'action', None),
+        getattr(view, 'throttle_scope', None)
+    )
+
+
+class ScopedCacheThrottle(ScopedRateThrottle):
+    """
+    Ограничение частоты запросов по областям из DEFAULT_THROTTLE_RATES.
+
+    Запросы считаются для пользователя, а для анонимных — для IP-адреса,
+    в фиксированном окне. Счётчик окна увеличивается атомарно в общем
+    кэше, поэтому лимит соблюдается для всех процессов сразу.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = get_scope(view)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        now = int(time.time())
+        window = now // self.duration
+        key = f'{self.get_cache_key(request, view)}:{window}'
+        cache = get_cache()
+        cache.add(key, 0, self.duration)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, self.duration)
+            count = 1
+        self.retry_after = (window + 1) * self.duration - now
+        return count <= self.num_requests
+
+    def wait(self):
+        return self.retry_after
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервер перегружен, повторите запрос позже.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        # Обработчик исключений DRF выставит заголовок Retry-After
+        self.wait = wait
+
+
+def acquire_slot(scope, budget):
+    """
+    Занимает одно из budget мест области или возвращает None.
+
+    Каждое место — отдельный ключ кэша со сроком жизни, так что место,
+    не освобождённое упавшим процессом, освобождается само.
+    """
+    cache = get_cache()
+    for slot in random.sample(range(budget), budget):
+        key = GATE_KEY.format(scope, slot)
+        if cache.add(key, 1, settings.CONCURRENCY_SLOT_TIMEOUT):
+            return key
+    return None
+
+
+def release_slot(key):
+    get_cache().delete(key)
+
+
+def release_after(content, key):
+    try:
+        yield from content
+    finally:
+        release_slot(key)
+
+
+class ConcurrencyGateMixin:
+    """
+    Отклоняет запрос с 503, если дорогих запросов той же области
+    выполняется больше, чем задано в CONCURRENCY_BUDGETS.
+    """
+    gate_slot = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        budget = settings.CONCURRENCY_BUDGETS.get(get_scope(self))
+        if not budget:
+            return
+        self.gate_slot = acquire_slot(get_scope(self), budget)
+        if self.gate_slot is None:
+            raise Overloaded(settings.CONCURRENCY_RETRY_AFTER)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.gate_slot is not None:
+            if response.streaming:
+                # Выгрузка продолжается после выхода из вьюхи
+                response.streaming_content = release_after(
+                    response.streaming_content, self.gate_slot
+                )
+            else:
+                release_slot(self.gate_slot)
+            self.gate_slot = None
+        return response
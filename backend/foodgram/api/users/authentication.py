@@ -0,0 +1,45 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import ApiUser
+from .tokens import TOKEN_USER_FIELDS, is_denied
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по JWT без запроса пользователя при чтении.
+
+    Для безопасных методов пользователь собирается из полей токена.
+    Для изменяющих запросов он загружается из БД, чтобы сохранение
+    не затёрло поля, которых в токене нет.
+    """
+
+    def authenticate(self, request):
+        self.stateless = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_denied(token):
+            raise InvalidToken('Токен отозван')
+        return token
+
+    def get_user(self, validated_token):
+        if not self.stateless:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Токен не содержит идентификатора пользователя')
+        user = ApiUser(
+            id=user_id,
+            **{
+                field: validated_token[field]
+                for field in TOKEN_USER_FIELDS
+                if field in validated_token
+            }
+        )
+        user._state.adding = False
+        return user
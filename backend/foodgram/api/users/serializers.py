@@ -1,6 +1,4 @@
-from django.shortcuts import get_object_or_404
 from django.core import exceptions as django_exceptions
-from django.db.models import Value, Count
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.hashers import make_password
@@ -8,8 +6,8 @@ from rest_framework import serializers
 from rest_framework.settings import api_settings
 from djoser.serializers import SetPasswordSerializer
 
-from api.base_serializers import ForWriteSeirlizer, FavoriteCartSerializer
-from users.models import Subscription, ApiUser
+from api.base_serializers import FavoriteCartSerializer
+from users.models import ApiUser
 from api.constants import (LENGTH_FOR_CHARFIELD,
                            LENGTH_FOR_EMAIL)
 
@@ -97,47 +95,14 @@ class ObtainTokenSerializer(serializers.Serializer):
         return attrs
 
 
-class SubscriptionSerializerForWrite(ForWriteSeirlizer):
-    user = serializers.StringRelatedField(
-        required=False,
-        read_only=True,
-        default=serializers.CurrentUserDefault()
-    )
-    relation = serializers.PrimaryKeyRelatedField(
-        read_only=True
-    )
-
-    class Meta:
-        model = Subscription
-        fields = ('user', 'relation')
-
-    def validate(self, attrs):
-        attrs['user'] = self.context['request'].user
-        attrs['relation_id'] = self.context['relation_id']
-        relation_object = get_object_or_404(
-            ApiUser, id=attrs['relation_id']
-        )
-        if self.context['request'].user == relation_object:
-            raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя'
-            )
-        return super().validate(attrs)
-
-    def to_representation(self, instance):
-        return SubscriptionSerializerForRead(
-            instance=ApiUser.objects.annotate(
-                is_subscribed=Value(True),
-                recipes_count=Count('recipes')
-            ).get(
-                id=instance.relation_id
-            ),
-            context=self.context['request']
-        ).data
-
-
 class SubscriptionSerializerForRead(serializers.ModelSerializer):
     is_subscribed = serializers.BooleanField()
-    recipes = serializers.SerializerMethodField('get_recipes')
+    # Рецепты подгружаются заранее через attach_author_recipes
+    recipes = FavoriteCartSerializer(
+        source='page_recipes',
+        many=True,
+        read_only=True
+    )
     recipes_count = serializers.IntegerField()
 
     class Meta:
@@ -152,15 +117,3 @@ class SubscriptionSerializerForRead(serializers.ModelSerializer):
             'recipes',
             'recipes_count'
         )
-
-    def get_recipes(self, instance):
-        user = ApiUser.objects.get(id=instance.pk)
-        if not self.context:
-            queryset = user.recipes.all()
-        else:
-            if 'recipes_limit' in self.context.query_params:
-                limit = int(self.context.query_params['recipes_limit'])
-                queryset = user.recipes.all()[:limit]
-            else:
-                queryset = user.recipes.all()
-        return FavoriteCartSerializer(queryset, many=True).data
@@ -0,0 +1,68 @@
+"""JWT-токены с данными пользователя и список отозванных токенов."""
+from datetime import datetime, timezone
+
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.cache import get_cache
+from users.models import ApiUser
+
+TOKEN_USER_FIELDS = ('username', 'role', 'is_staff', 'is_superuser')
+"""Поля пользователя, которые копируются в токен."""
+
+DENYLIST_KEY = 'jwt:denied:{}'
+
+
+class ApiRefreshToken(RefreshToken):
+
+    @classmethod
+    def for_user(cls, user):
+        # Поля наследует и токен доступа, выпущенный из этого токена
+        token = super().for_user(user)
+        for field in TOKEN_USER_FIELDS:
+            token[field] = getattr(user, field)
+        return token
+
+
+def deny(token):
+    """
+    Отзывает токен до истечения его срока.
+
+    Возвращает False, если токен уже был отозван.
+    """
+    timeout = token['exp'] - int(datetime.now(timezone.utc).timestamp())
+    if timeout <= 0:
+        return True
+    return get_cache().add(DENYLIST_KEY.format(token['jti']), 1, timeout)
+
+
+def is_denied(token):
+    return get_cache().get(DENYLIST_KEY.format(token['jti'])) is not None
+
+
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    """
+    Обновление пары токенов с ротацией.
+
+    Использованный токен обновления сразу отзывается, поэтому повторно
+    (в том числе параллельно) обменять его не получится. Новая пара
+    выпускается по текущим данным пользователя из БД: удалённый или
+    отключённый пользователь обновить токены не сможет, а изменённые
+    права попадут в новые токены.
+    """
+    token_class = ApiRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if not deny(refresh):
+            raise InvalidToken('Токен отозван')
+        user_id = refresh[api_settings.USER_ID_CLAIM]
+        user = ApiUser.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}, is_active=True
+        ).first()
+        if user is None:
+            raise InvalidToken('Пользователь не найден или отключён')
+        refresh = self.token_class.for_user(user)
+        return {'access': str(refresh.access_token), 'refresh': str(refresh)}
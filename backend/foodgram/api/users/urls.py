@@ -3,6 +3,9 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (ObtainTokenView,
                     DestroyTokenView,
+                    ObtainJWTView,
+                    RefreshJWTView,
+                    DestroyJWTView,
                     SubscribeViewSet,
                     ApiUserViewSet)
 
@@ -15,4 +18,7 @@ urlpatterns = [
     path('', include(users_router.urls)),
     path('auth/token/login/', ObtainTokenView.as_view(), name='token'),
     path('auth/token/logout/', DestroyTokenView.as_view(), name='logout'),
+    path('auth/jwt/create/', ObtainJWTView.as_view(), name='jwt_create'),
+    path('auth/jwt/refresh/', RefreshJWTView.as_view(), name='jwt_refresh'),
+    path('auth/jwt/logout/', DestroyJWTView.as_view(), name='jwt_logout'),
 ]
@@ -1,20 +1,39 @@
-from django.db.models import Value, Case, When, BooleanField, Count
+from django.db.models import Exists, OuterRef, Value
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status, permissions, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import Token as JWTToken
+from rest_framework_simplejwt.views import TokenRefreshView
 from djoser.views import UserViewSet
 
 from users.models import Subscription, ApiUser
-from api.methods import detail_post_method, detail_delete_method
+from api.methods import (attach_author_recipes,
+                         batch_delete_method,
+                         batch_post_method,
+                         detail_post_method,
+                         detail_delete_method,
+                         get_recipes_limit)
 from api.paginators import LimitParamPagination
 from api.permissions import IsAuthenticatedOrReadOnly
+from api.throttling import ConcurrencyGateMixin
 from .serializers import (ObtainTokenSerializer,
-                          SubscriptionSerializerForWrite,
                           SubscriptionSerializerForRead)
+from .tokens import ApiRefreshToken, RefreshTokenSerializer, deny
+
+
+def get_is_subscribed(user):
+    # Exists вместо соединения с подписками: пользователь с несколькими
+    # подписчиками не дублируется в выдаче
+    return Exists(
+        Subscription.objects.filter(user=user.id, relation=OuterRef('pk'))
+    )
 
 
 class ApiUserViewSet(UserViewSet):
@@ -23,20 +42,14 @@ class ApiUserViewSet(UserViewSet):
     ).order_by('-id')
     filter_backends = (DjangoFilterBackend,)
     pagination_class = LimitParamPagination
+    cursor_ordering = ('-id',)
     http_method_names = ['get', 'post']
 
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return self.queryset
         queryset = ApiUser.objects.all().annotate(
-            is_subscribed=Case(
-                When(
-                    subscriptions__user__exact=self.request.user.id,
-                    then=Value(True)
-                ),
-                default=Value(False),
-                output_field=BooleanField()
-            )
+            is_subscribed=get_is_subscribed(self.request.user)
         ).order_by('-id')
         return queryset
 
@@ -58,23 +71,35 @@ class ApiUserViewSet(UserViewSet):
         permission_classes=[permissions.IsAuthenticated],
     )
     def get_subscriptions(self, request, *args, **kwargs):
-        queryset = self.get_queryset().annotate(
-            recipes_count=Count('recipes')
-        ).filter(
-            is_subscribed=True
-        )
+        # Подписка уникальна, поэтому соединение не дублирует авторов
+        queryset = ApiUser.objects.filter(
+            subscriptions__user=request.user
+        ).annotate(
+            is_subscribed=Value(True)
+        ).order_by('-id')
+        recipes_limit = get_recipes_limit(request)
+        context = self.get_serializer_context()
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = SubscriptionSerializerForRead(
-                page, many=True, context=self.request
+                attach_author_recipes(page, recipes_limit),
+                many=True,
+                context=context
             )
             return self.get_paginated_response(serializer.data)
-        serializer = SubscriptionSerializerForRead(queryset, many=True)
+        serializer = SubscriptionSerializerForRead(
+            attach_author_recipes(list(queryset), recipes_limit),
+            many=True,
+            context=context
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ObtainTokenView(ObtainAuthToken):
+class ObtainTokenView(ConcurrencyGateMixin, ObtainAuthToken):
     serializer_class = ObtainTokenSerializer
+    # ObtainAuthToken отключает ограничения частоты, они возвращаются
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
         serializer = ObtainTokenSerializer(data=request.data)
@@ -93,6 +118,48 @@ class DestroyTokenView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class ObtainJWTView(ConcurrencyGateMixin, APIView):
+    permission_classes = (permissions.AllowAny,)
+    authentication_classes = ()
+    throttle_scope = 'login'
+
+    def post(self, request, *args, **kwargs):
+        serializer = ObtainTokenSerializer(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        refresh = ApiRefreshToken.for_user(
+            serializer.validated_data['user']
+        )
+        return Response(
+            {'access': str(refresh.access_token), 'refresh': str(refresh)}
+        )
+
+
+class RefreshJWTView(TokenRefreshView):
+    serializer_class = RefreshTokenSerializer
+
+
+class DestroyJWTView(APIView):
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request, *args, **kwargs):
+        # Без токена ApiRefreshToken выпустил бы новый вместо проверки
+        refresh = request.data.get('refresh')
+        if not refresh or not isinstance(refresh, str):
+            raise ValidationError({'refresh': 'Обязательное поле.'})
+        try:
+            refresh = ApiRefreshToken(refresh)
+        except TokenError as error:
+            raise InvalidToken(error.args[0])
+        deny(refresh)
+        # Токен доступа из заголовка тоже отзывается до истечения срока,
+        # у токенов DRF Token отзывать нечего
+        if isinstance(request.auth, JWTToken):
+            deny(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class SubscribeViewSet(mixins.CreateModelMixin,
                        mixins.DestroyModelMixin,
                        viewsets.GenericViewSet):
@@ -105,28 +172,10 @@ class SubscribeViewSet(mixins.CreateModelMixin,
 
     def get_queryset(self):
         queryset = ApiUser.objects.all().annotate(
-            is_subscribed=Case(
-                When(
-                    subscriptions__user__exact=self.request.user.id,
-                    then=Value(True)
-                ),
-                default=Value(False),
-                output_field=BooleanField()
-            )
+            is_subscribed=get_is_subscribed(self.request.user)
         ).order_by('id')
         return queryset
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        if self.request.method not in permissions.SAFE_METHODS:
-            context.update({'relation_id': self.kwargs['pk']})
-        return context
-
-    def get_serializer_class(self):
-        if self.request.method not in permissions.SAFE_METHODS:
-            return SubscriptionSerializerForWrite
-        return SubscriptionSerializerForRead
-
     @action(
         methods=['POST'],
         detail=True,
@@ -138,3 +187,15 @@ class SubscribeViewSet(mixins.CreateModelMixin,
     @subscribe.mapping.delete
     def unsubscribe(self, request, pk):
         return detail_delete_method(self, request, self.kwargs['pk'])
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='subscribe/batch'
+    )
+    def subscribe_batch(self, request):
+        return batch_post_method(self, request)
+
+    @subscribe_batch.mapping.delete
+    def unsubscribe_batch(self, request):
+        return batch_delete_method(self, request)
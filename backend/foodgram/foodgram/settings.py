@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -69,6 +70,19 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+RECIPES_CACHE_ALIAS = 'default'
+
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', 300))
+
 AUTH_USER_MODEL = 'users.ApiUser'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -93,8 +107,39 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.users.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
+    # Лимиты задаются для областей throttle_scope/throttle_scopes вьюх,
+    # вьюхи без области не ограничиваются
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ScopedCacheThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('THROTTLE_LOGIN_RATE', '10/min'),
+        'cart_export': os.getenv('THROTTLE_CART_EXPORT_RATE', '10/min'),
+        'recipe_write': os.getenv('THROTTLE_RECIPE_WRITE_RATE', '30/hour'),
+    },
+}
+
+CONCURRENCY_BUDGETS = {
+    'login': int(os.getenv('CONCURRENCY_LOGIN', 8)),
+    'cart_export': int(os.getenv('CONCURRENCY_CART_EXPORT', 4)),
+    'recipe_write': int(os.getenv('CONCURRENCY_RECIPE_WRITE', 8)),
+}
+CONCURRENCY_SLOT_TIMEOUT = 60
+CONCURRENCY_RETRY_AFTER = 5
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 10))
+    ),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 14))
+    ),
+    'ROTATE_REFRESH_TOKENS': True,
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'UPDATE_LAST_LOGIN': False,
 }
 
 DJOSER = {
@@ -126,4 +171,22 @@ MEDIA_URL = 'media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+CART_PDF_FONT_PATH = os.getenv(
+    'CART_PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+IMAGE_VARIANTS_ASYNC = True
+
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', 2))
+
+IMAGE_VARIANTS_MAX_PENDING = int(os.getenv('IMAGE_VARIANTS_MAX_PENDING', 32))
+
+SIMILAR_RECIPES_ASYNC = True
+
+SIMILAR_RECIPES_WORKERS = int(os.getenv('SIMILAR_RECIPES_WORKERS', 1))
+
+SIMILAR_RECIPES_MAX_PENDING = int(
+    os.getenv('SIMILAR_RECIPES_MAX_PENDING', 64)
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
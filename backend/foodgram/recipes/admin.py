@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.db.models import Prefetch
 
+from api.cart import refresh_recipe_carts
+from api.recipes.serializers import update_recipe_document
+from api.similar import schedule_similar
 from .models import RecipeIngredient, Tag, Ingredient, Recipe
 
 
@@ -13,12 +17,16 @@ class TagAdmin(admin.ModelAdmin):
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    search_fields = ('name',)
+    # Поиск по началу названия использует индекс по UPPER(name)
+    search_fields = ('^name',)
+    ordering = ('name',)
 
 
 class IngredientInLine(admin.TabularInline):
     model = RecipeIngredient
     min_num = 1
+    extra = 0
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
@@ -31,12 +39,33 @@ class RecipeAdmin(admin.ModelAdmin):
         'get_ingredients',
         'get_tags',
         'cooking_time',
-        'get_favorites_count',
+        'favorites_count',
         'created_at'
     )
+    list_select_related = ('author',)
+    list_filter = ('tags', ('author', admin.RelatedOnlyFieldListFilter))
+    search_fields = ('^name',)
+    show_full_result_count = False
+    autocomplete_fields = ('author',)
     filter_horizontal = ('tags',)
     inlines = [IngredientInLine]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('name')),
+            Prefetch('ingredients', queryset=Ingredient.objects.only('name'))
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_recipe_document(form.instance)
+        if change:
+            refresh_recipe_carts(form.instance)
+        if 'tags' in form.changed_data or any(
+            formset.has_changed() for formset in formsets
+        ):
+            schedule_similar(form.instance.pk)
+
     @admin.display(description='Ингредиенты')
     def get_ingredients(self, obj):
         return ' ,'.join(
@@ -48,7 +77,3 @@ class RecipeAdmin(admin.ModelAdmin):
         return ' ,'.join(
             [tag.name for tag in obj.tags.all()]
         )
-
-    @admin.display(description='Добавлений в избранное')
-    def get_favorites_count(self, obj):
-        return obj.favoriterecipe_set.all().count()
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='document',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Документ для чтения'),
+        ),
+    ]
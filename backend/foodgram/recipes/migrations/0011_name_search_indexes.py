@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-18 03:32
+
+from django.conf import settings
+from django.db import migrations
+
+# Индексы для поиска по началу названия (istartswith). Класс операторов
+# text_pattern_ops есть только в PostgreSQL, поэтому индексы создаются
+# вручную и не входят в состояние моделей
+NAME_INDEXES = (
+    ('ingredient_name_upper_idx', 'recipes_ingredient'),
+    ('recipe_name_upper_idx', 'recipes_recipe'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in NAME_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" '
+            f'ON "{table}" (UPPER("name") text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in NAME_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
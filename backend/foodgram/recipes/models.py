@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from colorfield.fields import ColorField
@@ -9,10 +11,12 @@ from api.constants import (LENGTH_FOR_CHARFIELD,
                            MIN_VALIDATOR_ERROR_MESSAGE,
                            MAX_AMOUNT_VALUE,
                            MAX_VALIDATOR_ERROR_MESSAGE)
+from users.mixins import DerivedFieldsMixin
 from users.models import ApiUser
+from .storage import ContentAddressedStorage
 
 
-class Recipe(models.Model):
+class Recipe(DerivedFieldsMixin, models.Model):
     author = models.ForeignKey(
         ApiUser,
         on_delete=models.CASCADE,
@@ -23,7 +27,16 @@ class Recipe(models.Model):
         verbose_name='Название',
         max_length=LENGTH_FOR_RECIPE_NAME
     )
-    image = models.ImageField()
+    image = models.ImageField(
+        upload_to='recipes/',
+        storage=ContentAddressedStorage()
+    )
+    # Имена файлов уменьшенных копий изображения, заполняются в фоне
+    image_variants = models.JSONField(
+        verbose_name='Копии изображения',
+        default=dict,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание',
         max_length=LENGTH_FOR_TEXTFIELD
@@ -47,11 +60,50 @@ class Recipe(models.Model):
         )
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Готовое представление тэгов, ингредиентов и автора для чтения,
+    # пересобирается при записи рецепта и связанных с ним объектов
+    document = models.JSONField(
+        verbose_name='Документ для чтения',
+        default=dict,
+        editable=False
+    )
+    # Счётчики меняются только через F() в api.counters и api.relations
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+        db_index=True
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в корзину',
+        default=0,
+        editable=False,
+        db_index=True
+    )
+    # Полнотекстовый вектор, пересобирается вместе с документом
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    derived_fields = (
+        'image_variants',
+        'document',
+        'favorites_count',
+        'in_carts_count',
+        'search_vector'
+    )
 
+    # Индекс по UPPER(name) для поиска по началу названия есть только
+    # в PostgreSQL и создаётся миграцией 0011_name_search_indexes
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='recipe_created_at_id_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector_idx')
+        ]
 
     def __str__(self):
         return self.name
@@ -91,6 +143,7 @@ class Ingredient(models.Model):
         max_length=LENGTH_FOR_CHARFIELD
     )
 
+    # Индекс по UPPER(name) создаётся миграцией 0011_name_search_indexes
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
@@ -168,3 +221,81 @@ class ShoppingCartRecipe(models.Model):
                 name='unique cart'
             )
         ]
+
+
+class ShoppingCartIngredient(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя."""
+    user = models.ForeignKey(ApiUser, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        default_related_name = 'cart_ingredients'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique cart ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return self.ingredient.name
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя."""
+    user = models.ForeignKey(ApiUser, on_delete=models.CASCADE)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    # Копия даты рецепта, чтобы лента читалась и обрезалась по индексу
+    created_at = models.DateTimeField()
+
+    class Meta:
+        default_related_name = 'feed_entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique feed entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-recipe'],
+                name='feed_user_created_at_idx'
+            )
+        ]
+
+    def __str__(self):
+        return self.recipe.name
+
+
+class SimilarRecipe(models.Model):
+    """Рецепт, похожий на данный по ингредиентам и тэгам."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_entries'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to'
+    )
+    # Косинусная близость векторов ингредиентов и тэгов
+    score = models.FloatField(verbose_name='Близость')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique similar recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return self.similar.name
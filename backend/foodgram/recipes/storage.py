@@ -0,0 +1,36 @@
+import hashlib
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, именующее файлы по SHA-256 их содержимого.
+
+    Файл кладётся в <каталог>/<ab>/<cd>/<хэш><расширение>. Повторная
+    загрузка того же содержимого не пишет файл заново, а возвращает
+    имя уже сохранённого, поэтому содержимое по одному URL не меняется
+    и его можно кэшировать бессрочно.
+    """
+
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        path = PurePosixPath(name)
+        return str(
+            path.parent / digest[:2] / digest[2:4]
+            / f'{digest}{path.suffix.lower()}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
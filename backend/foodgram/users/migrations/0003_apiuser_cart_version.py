@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_subscription_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiuser',
+            name='cart_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия корзины'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.3 on 2026-10-18 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_apiuser_cart_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='apiuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+    ]
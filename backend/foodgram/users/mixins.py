@@ -0,0 +1,24 @@
+class DerivedFieldsMixin:
+    """
+    Модель с полями, которые меняются только запросами UPDATE.
+
+    Счётчики увеличиваются через F(), а производные поля пишут фоновые
+    задачи, поэтому обычное сохранение загруженного объекта их не
+    записывает: иначе оно вернуло бы в БД устаревшие значения.
+    """
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.derived_fields
+            ]
+        super().save(*args, **kwargs)
@@ -6,9 +6,10 @@ from django.contrib.auth.validators import UnicodeUsernameValidator
 from api.constants import (LENGTH_FOR_CHARFIELD,
                            LENGTH_FOR_EMAIL,
                            LEN_ERROR_MESSAGE)
+from .mixins import DerivedFieldsMixin
 
 
-class ApiUser(AbstractUser):
+class ApiUser(DerivedFieldsMixin, AbstractUser):
 
     class UserRoles(models.TextChoices):
         USER = 'user', 'Пользователь'
@@ -53,6 +54,27 @@ class ApiUser(AbstractUser):
         max_length=LENGTH_FOR_CHARFIELD,
         verbose_name='Роль'
     )
+    # Увеличивается через F() при каждом изменении содержимого корзины
+    cart_version = models.PositiveIntegerField(
+        verbose_name='Версия корзины',
+        default=0,
+        editable=False
+    )
+    # Счётчики меняются только через F() в api.counters и api.relations
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+        db_index=True
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+        db_index=True
+    )
+
+    derived_fields = ('cart_version', 'recipes_count', 'followers_count')
 
     class Meta:
         verbose_name = 'Пользователь'